@@ -0,0 +1,136 @@
+"""Measures how fast the engines step as the number of teams, the agents per
+team and the map size grow. Every case runs in a fresh process, so its
+memory use and setup time are not affected by the cases before it.
+
+    python -m benchmarks.scaling --teams 2 8 --agents 10 100 --sizes 100 500
+"""
+
+import argparse
+import json
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from itertools import product
+
+from src.config import GameConfig
+from src.simulation import Simulation
+from src.swarm import Swarm
+
+ENGINES = {"objects": Simulation, "swarm": Swarm}
+
+# Resources no team can collect, so that the games last the whole benchmark.
+UNREACHABLE_GOAL = {"wood": 10**9, "wheat": 10**9, "iron": 10**9}
+
+
+@dataclass(frozen=True)
+class Case:
+    engine: str
+    teams: int
+    agents: int
+    size: int
+
+
+@dataclass(frozen=True)
+class Measurement:
+    case: Case
+    setup_seconds: float
+    ticks: int
+    ticks_per_second: float
+    # Peak resident memory of the process running the case.
+    max_rss_mb: float
+
+
+def make_config(case: Case) -> GameConfig:
+    cells = case.size * case.size
+    return GameConfig(
+        agents=case.agents,
+        energy_pots=cells // 100,
+        energy_pots_energy=100,
+        golds=cells // 200,
+        energy_pot_price=2,
+        map_price=3,
+        width=case.size,
+        height=case.size,
+        resources={"wood": 2, "wheat": 2, "iron": 2},
+        teams=[dict(UNREACHABLE_GOAL) for _ in range(case.teams)],
+    )
+
+
+def measure(case: Case, ticks: int, time_limit: float) -> Measurement:
+    """Builds a game for `case` and steps it `ticks` times, or for as many
+    ticks as fit in `time_limit` seconds."""
+    start = time.perf_counter()
+    engine = ENGINES[case.engine](make_config(case), seed=0)
+    setup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    done = 0
+    while done < ticks and time.perf_counter() - start < time_limit:
+        engine.step()
+        done += 1
+    elapsed = time.perf_counter() - start
+
+    return Measurement(
+        case,
+        setup_seconds=setup,
+        ticks=done,
+        ticks_per_second=done / elapsed if elapsed > 0 else 0.0,
+        max_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Engine scaling benchmark")
+    parser.add_argument(
+        "--engines", nargs="+", choices=sorted(ENGINES), default=sorted(ENGINES)
+    )
+    parser.add_argument("--teams", nargs="+", type=int, default=[2, 4, 8])
+    parser.add_argument("--agents", nargs="+", type=int, default=[10, 100])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 250, 500])
+    parser.add_argument("--ticks", type=int, default=50, help="ticks per case")
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        default=30.0,
+        help="seconds of stepping per case, fewer ticks are run past it",
+    )
+    parser.add_argument("--json", help="file to write the measurements to")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    cases = [
+        Case(engine, teams, agents, size)
+        for engine, teams, agents, size in product(
+            args.engines, args.teams, args.agents, args.sizes
+        )
+    ]
+
+    print(
+        f"{'engine':>8} {'teams':>5} {'agents':>6} {'size':>5} "
+        f"{'setup s':>8} {'ticks':>5} {'ticks/s':>9} {'rss MB':>8}"
+    )
+    measurements = []
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            measurement = executor.submit(
+                measure, case, args.ticks, args.time_limit
+            ).result()
+
+        measurements.append(measurement)
+        print(
+            f"{case.engine:>8} {case.teams:>5} {case.agents:>6} {case.size:>5} "
+            f"{measurement.setup_seconds:>8.2f} {measurement.ticks:>5} "
+            f"{measurement.ticks_per_second:>9.1f} {measurement.max_rss_mb:>8.0f}",
+            flush=True,
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([asdict(m) for m in measurements], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Plays the benchmark scenarios headlessly and compares them to a baseline.
+Every scenario is a game config in `benchmarks/scenarios`, with an optional
+`[benchmark]` table, and is played in a fresh process so that its memory
+use is its own.
+
+    python -m benchmarks.suite --save baseline.json
+    python -m benchmarks.suite --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import toml
+
+from src import profiling
+from src.config import GameConfig, load_config
+from src.simulation import DEFAULT_MAX_ROUNDS, Simulation
+from src.swarm import Swarm
+
+ENGINES = {"objects": Simulation, "swarm": Swarm}
+SCENARIOS_DIR = os.path.join(os.path.dirname(__file__), "scenarios")
+
+# Relative change of a metric past which it counts as a regression.
+DEFAULT_TOLERANCE = 0.1
+
+
+@dataclass(frozen=True)
+class Result:
+    scenario: str
+    engine: str
+    # Rounds played, the rounds to win if there is a winner.
+    rounds: int
+    # Index of the winning team, None if no team won in time.
+    winner: Optional[int]
+    ticks_per_second: float
+    # Seconds spent in each phase of the game.
+    phases: dict[str, float]
+    # Peak resident memory of the process that played the scenario.
+    max_rss_mb: float
+    state_hash: int
+
+
+@dataclass(frozen=True)
+class Regression:
+    scenario: str
+    engine: str
+    metric: str
+    baseline: float
+    current: float
+
+    def __str__(self) -> str:
+        return (
+            f"{self.scenario} ({self.engine}): {self.metric} "
+            f"{self.baseline:.6g} -> {self.current:.6g}"
+        )
+
+
+def load_scenario(path: str) -> tuple[GameConfig, dict]:
+    """Reads a scenario file into its game config and its `[benchmark]`
+    settings."""
+    with open(path, "r") as f:
+        settings = toml.load(f).get("benchmark", {})
+    return load_config(path, max_agents=None), settings
+
+
+def find_scenarios(directory: str, names: Optional[list[str]] = None) -> list[str]:
+    paths = sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.endswith(".toml")
+    )
+    if names is not None:
+        paths = [p for p in paths if scenario_name(p) in names]
+    return paths
+
+
+def scenario_name(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def run_scenario(
+    path: str,
+    engine: str,
+    max_rounds: Optional[int],
+    time_limit: float,
+    profile: bool = False,
+) -> Result:
+    """Plays the scenario until a team wins, the round limit is reached or
+    `time_limit` seconds of play have passed. With `profile`, the phases
+    timed by `src.profiling` are added to the setup and play times."""
+    config, settings = load_scenario(path)
+    if profile:
+        profiling.enable()
+    if max_rounds is None:
+        max_rounds = settings.get("max_rounds", DEFAULT_MAX_ROUNDS)
+
+    start = time.perf_counter()
+    game = ENGINES[engine](config)
+    setup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    while not game.is_finished and game.round < max_rounds:
+        game.step()
+        if time.perf_counter() - start >= time_limit:
+            break
+    elapsed = time.perf_counter() - start
+
+    return Result(
+        scenario_name(path),
+        engine,
+        rounds=game.round,
+        winner=game.result().winner,
+        ticks_per_second=game.round / elapsed if elapsed > 0 else 0.0,
+        phases={"setup": setup, "play": elapsed, **profiling.PROFILER.totals()},
+        max_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        state_hash=game.state_hash(),
+    )
+
+
+def compare(
+    baseline: list[Result], current: list[Result], tolerance: float
+) -> tuple[list[Regression], list[str]]:
+    """Returns the regressions of `current` against `baseline`, and notes on
+    the scenarios that played a different game, where the speeds are not
+    comparable."""
+    previous = {(r.scenario, r.engine): r for r in baseline}
+    regressions = []
+    notes = []
+    for result in current:
+        old = previous.get((result.scenario, result.engine))
+        if old is None:
+            notes.append(f"{result.scenario} ({result.engine}): not in the baseline")
+            continue
+        if old.state_hash != result.state_hash or old.rounds != result.rounds:
+            notes.append(
+                f"{result.scenario} ({result.engine}): the game changed, "
+                f"{old.rounds} -> {result.rounds} rounds, "
+                f"winner {old.winner} -> {result.winner}"
+            )
+
+        def check(metric: str, old_value: float, new_value: float, higher: bool):
+            # `higher` is whether a higher value is better.
+            limit = old_value * (1 - tolerance if higher else 1 + tolerance)
+            if new_value < limit if higher else new_value > limit:
+                regressions.append(
+                    Regression(
+                        result.scenario, result.engine, metric, old_value, new_value
+                    )
+                )
+
+        check("ticks_per_second", old.ticks_per_second, result.ticks_per_second, True)
+        check("max_rss_mb", old.max_rss_mb, result.max_rss_mb, False)
+        for phase, seconds in result.phases.items():
+            if phase in old.phases:
+                check(f"phases.{phase}", old.phases[phase], seconds, False)
+
+    return regressions, notes
+
+
+def save_results(path: str, results: list[Result]):
+    with open(path, "w") as f:
+        json.dump([asdict(r) for r in results], f, indent=2)
+
+
+def load_results(path: str) -> list[Result]:
+    with open(path, "r") as f:
+        return [Result(**r) for r in json.load(f)]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark scenarios of the game")
+    parser.add_argument(
+        "--scenarios", nargs="+", help="names of the scenarios to play, all if unset"
+    )
+    parser.add_argument("--directory", default=SCENARIOS_DIR)
+    parser.add_argument(
+        "--engines", nargs="+", choices=sorted(ENGINES), default=["objects"]
+    )
+    parser.add_argument(
+        "--max-rounds",
+        type=int,
+        help="round limit, overrides the one of the scenarios",
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        default=120.0,
+        help="seconds of play per scenario, the game is cut short past it",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="plays of every scenario, the fastest one is kept",
+    )
+    parser.add_argument("--save", help="file to write the results to")
+    parser.add_argument("--compare", help="baseline file to check the results against")
+    parser.add_argument(
+        "--results",
+        help="results file to compare instead of playing the scenarios",
+    )
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time the phases of the engines too, at some cost in speed",
+    )
+    return parser.parse_args()
+
+
+def play(args: argparse.Namespace) -> list[Result]:
+    print(
+        f"{'scenario':>16} {'engine':>8} {'setup s':>8} {'rounds':>6} "
+        f"{'winner':>6} {'ticks/s':>9} {'rss MB':>7}"
+    )
+    results = []
+    for path in find_scenarios(args.directory, args.scenarios):
+        for engine in args.engines:
+            plays = []
+            for _ in range(args.repeat):
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    plays.append(
+                        executor.submit(
+                            run_scenario,
+                            path,
+                            engine,
+                            args.max_rounds,
+                            args.time_limit,
+                            args.profile,
+                        ).result()
+                    )
+
+            result = max(plays, key=lambda r: r.ticks_per_second)
+            results.append(result)
+            winner = "-" if result.winner is None else result.winner
+            print(
+                f"{result.scenario:>16} {engine:>8} {result.phases['setup']:>8.2f} "
+                f"{result.rounds:>6} {winner:>6} {result.ticks_per_second:>9.1f} "
+                f"{result.max_rss_mb:>7.0f}",
+                flush=True,
+            )
+    return results
+
+
+def main():
+    args = parse_args()
+    results = load_results(args.results) if args.results else play(args)
+    if args.save:
+        save_results(args.save, results)
+
+    if args.compare:
+        regressions, notes = compare(
+            load_results(args.compare), results, args.tolerance
+        )
+        for note in notes:
+            print(f"note: {note}")
+        for regression in regressions:
+            print(f"regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,205 @@
+import argparse
+import logging
+import sys
+from contextlib import ExitStack
+
+from src import profiling
+from src.checkpoint import load_checkpoint, save_checkpoint
 from src.config import load_config
-from src.constants import *
-from src.game import Game
-from src.get_configuration import ConfigMenu
+from src.logger import configure_logging
+from src.map_cache import configure_map_cache
+from src.simulation import DEFAULT_MAX_ROUNDS, Simulation
+from src.snapshot import SnapshotRecorder, save_snapshot
+from src.swarm import Swarm
 
 
-def main():
-    config_menu = ConfigMenu()
-    config_menu.show()
-    config_path = config_menu.config_path
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Smart Agents")
+    parser.add_argument(
+        "--config",
+        help="configuration file, asked for through a dialog when omitted",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="run the simulation without opening a window",
+    )
+    parser.add_argument(
+        "--max-rounds",
+        type=int,
+        default=DEFAULT_MAX_ROUNDS,
+        help="round limit of a headless run",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("objects", "swarm"),
+        default="objects",
+        help="engine of a headless run, swarm scales to thousands of agents",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="seed of the game, overrides the one in the configuration",
+    )
+    parser.add_argument(
+        "--hash-trace",
+        help="file to write the state hash of every round of a headless run to",
+    )
+    parser.add_argument(
+        "--snapshot",
+        help="npz file to save the final state of a headless run to",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="file to save the whole state of a headless run to when it stops",
+    )
+    parser.add_argument(
+        "--restore",
+        help="checkpoint to resume a game from instead of starting a new one",
+    )
+    parser.add_argument(
+        "--save-map",
+        help="file to save the starting map of a headless run to, .npy or text",
+    )
+    parser.add_argument(
+        "--map-cache",
+        help="directory of generated maps, reused by games of the same seed",
+    )
+    parser.add_argument(
+        "--record",
+        help="directory to record snapshots of a headless run to",
+    )
+    parser.add_argument(
+        "--record-every",
+        type=int,
+        default=1,
+        help="rounds between the recorded snapshots",
+    )
+    parser.add_argument(
+        "--log",
+        default="logging.log",
+        help="log file, written by a background thread",
+    )
+    parser.add_argument("--no-log", action="store_true", help="turn logging off")
+    parser.add_argument(
+        "--log-level",
+        choices=("DEBUG", "INFO", "WARNING"),
+        default="INFO",
+        help="DEBUG adds a line per agent and round",
+    )
+    parser.add_argument(
+        "--log-events",
+        action="store_true",
+        help="write the log as one JSON event per line",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time the phases of the game and print them when it ends",
+    )
+    parser.add_argument(
+        "--profile-every",
+        type=int,
+        help="rounds between the timings printed during a headless run",
+    )
+    return parser.parse_args()
+
+
+def print_profile(title: str):
+    print(f"{title}\n{profiling.PROFILER.report()}", file=sys.stderr, flush=True)
+
+
+def run_headless(args: argparse.Namespace):
+    config_path = args.config or "custom.toml"
+    if args.restore is not None:
+        game: Simulation | Swarm = load_checkpoint(args.restore)
+    elif args.engine == "swarm":
+        game = Swarm(load_config(config_path, None), args.seed)
+    else:
+        game = Simulation(load_config(config_path), args.seed)
+    if args.save_map is not None:
+        game.map.save(args.save_map)
+
+    with ExitStack() as stack:
+        trace = None
+        if args.hash_trace is not None:
+            # One line per round, so that two traces can be compared with
+            # diff to find the first round where the games went apart.
+            trace = stack.enter_context(open(args.hash_trace, "w"))
+            trace.write(f"seed {game.seed}\n")
+            trace.write(f"{game.round} {game.state_hash():016x}\n")
+
+        recorder = None
+        if args.record is not None:
+            recorder = stack.enter_context(
+                SnapshotRecorder(args.record, args.record_every)
+            )
+            recorder.record(game)
+
+        while not game.is_finished and game.round < args.max_rounds:
+            game.step()
+            if trace is not None:
+                trace.write(f"{game.round} {game.state_hash():016x}\n")
+            if recorder is not None:
+                recorder.record(game)
+            if args.profile_every and game.round % args.profile_every == 0:
+                print_profile(f"round {game.round}")
+
+        if recorder is not None and game.round % recorder.every != 0:
+            recorder.record(game, force=True)
+
+    if args.snapshot is not None:
+        save_snapshot(args.snapshot, game, compressed=True)
+    if args.checkpoint is not None:
+        save_checkpoint(args.checkpoint, game)
+    print(game.result())
+
+
+def run_window(config_path: str | None, restore: str | None = None):
+    # The window dependencies are imported lazily so that headless runs
+    # work on machines without a display or OpenGL.
+    from src.constants import TITLE, WINDOW_HEIGHT, WINDOW_WIDTH
+    from src.game import Game
+    from src.get_configuration import ConfigMenu
+
+    if restore is not None:
+        simulation = load_checkpoint(restore)
+        if not isinstance(simulation, Simulation):
+            raise ValueError("Only checkpoints of the objects engine can be shown.")
+        game = Game(WINDOW_WIDTH, WINDOW_HEIGHT, TITLE, simulation.config, simulation)
+        game.run()
+        return
+
+    if config_path is None:
+        config_menu = ConfigMenu()
+        config_menu.show()
+        config_path = config_menu.config_path
+
     print(f"config file: {config_path}")
     config = load_config(config_path)
     game = Game(WINDOW_WIDTH, WINDOW_HEIGHT, TITLE, config)
     game.run()
 
 
+def main():
+    args = parse_args()
+    configure_logging(
+        None if args.no_log else args.log,
+        getattr(logging, args.log_level),
+        args.log_events,
+    )
+    configure_map_cache(args.map_cache)
+    if args.profile or args.profile_every:
+        profiling.enable()
+
+    if args.headless:
+        run_headless(args)
+    else:
+        run_window(args.config, args.restore)
+
+    if profiling.is_enabled():
+        print_profile("profile")
+
+
 if __name__ == "__main__":
     main()
@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+import logging
 from dataclasses import dataclass
 from enum import StrEnum, auto
-from random import randint
 from typing import Optional
 
+import numpy as np
+
+from . import profiling
 from .config import GameConfig
 from .logger import LOGGER
 from .map import Map
+from .occupancy import Occupancy
+from .pathfinding import DistanceField, PathPlanner
+from .reservations import Reservations
 from .tiles import Tiles, TileType
 from .types import Coords
 
@@ -21,6 +27,10 @@ class State(StrEnum):
     SEARCHING_FOR_ENERGY_POT = auto()
 
 
+# Small integer code of every state, e.g. to hash or store agent states.
+STATE_CODES = {state: code for code, state in enumerate(State)}
+
+
 class Energy(StrEnum):
     ENERGETIC = auto()
     EXCHAUSTED = auto()
@@ -42,43 +52,44 @@ class ResourcePile:
         self.wood = 0
         self.iron = 0
         self.wheat = 0
-        self.wanted_resources: list[TileType] = []
+        # Bit `1 << index` is set for every resource tile still wanted.
+        self.wanted = 0
 
         if wood > 0:
-            self.wanted_resources.append(Tiles.WOOD)
+            self.wanted |= 1 << Tiles.WOOD.index
         if iron > 0:
-            self.wanted_resources.append(Tiles.IRON)
+            self.wanted |= 1 << Tiles.IRON.index
         if wheat > 0:
-            self.wanted_resources.append(Tiles.WHEAT)
+            self.wanted |= 1 << Tiles.WHEAT.index
 
-    def add(self, resource: TileType):
-        if resource == Tiles.WOOD:
-            self.wood += 1
+    @property
+    def wanted_codes(self) -> list[int]:
+        return [
+            code for code in range(self.wanted.bit_length()) if self.is_needed(code)
+        ]
 
-            if (
-                self.wood >= self.wanted_wood_count
-                and Tiles.WOOD in self.wanted_resources
-            ):
-                self.wanted_resources.remove(Tiles.WOOD)
-        elif resource == Tiles.IRON:
+    def add(self, resource: TileType | int):
+        code = int(resource)
+        if code == Tiles.WOOD.index:
+            self.wood += 1
+            collected = self.wood >= self.wanted_wood_count
+        elif code == Tiles.IRON.index:
             self.iron += 1
-
-            if (
-                self.iron >= self.wanted_iron_count
-                and Tiles.IRON in self.wanted_resources
-            ):
-                self.wanted_resources.remove(Tiles.IRON)
-        elif resource == Tiles.WHEAT:
+            collected = self.iron >= self.wanted_iron_count
+        elif code == Tiles.WHEAT.index:
             self.wheat += 1
+            collected = self.wheat >= self.wanted_wheat_count
+        else:
+            return
+
+        if collected:
+            self.wanted &= ~(1 << code)
 
-            if (
-                self.wheat >= self.wanted_wheat_count
-                and Tiles.WHEAT in self.wanted_resources
-            ):
-                self.wanted_resources.remove(Tiles.WHEAT)
+    def is_needed(self, tile: TileType | int) -> bool:
+        return bool(self.wanted >> int(tile) & 1)
 
-    def is_needed(self, tile: TileType) -> bool:
-        return tile in self.wanted_resources
+    def as_dict(self) -> dict[str, int]:
+        return {"wood": self.wood, "iron": self.iron, "wheat": self.wheat}
 
     def get_resourse_repr(self) -> str:
         lines = [
@@ -104,22 +115,36 @@ class Team:
         resources: ResourcePile,
         agent_tile: TileType,
         config: GameConfig,
+        move_range: int = 1,
+        vision_radius: Optional[int] = None,
     ):
         self.id = self.get_id()
         self.config = config
         self.village = village
         self.resources = resources
         self.agent_tile = agent_tile
+        self.move_range = move_range
+        # How far the agents see around them. Defaults to their move range.
+        self.vision_radius = move_range if vision_radius is None else vision_radius
         self.agents: list[Agent] = []
-        self.targets = []
+        # Resources and energy pots the agents are heading to. A reservation
+        # outlives the longest trip across the map only if it is abandoned.
+        self.reservations = Reservations(ttl=config.width + config.height)
+        # Distances to the village tiles, shared by all the agents of the
+        # team for their storage trips. Built once the map exists.
+        self.village_field: Optional[DistanceField] = None
 
     @classmethod
     def get_id(cls) -> int:
         cls._id_counter += 1
         return cls._id_counter
 
+    def build_village_field(self, game_map: Map):
+        self.village_field = DistanceField(game_map, game_map.mask([self.village.tile]))
+
     def print_resources(self):
-        LOGGER.info(f"Team {self.id} {self.resources}")
+        if LOGGER.isEnabledFor(logging.INFO):
+            LOGGER.info("Team %s %s", self.id, repr(self.resources))
 
 
 class Agent:
@@ -130,30 +155,40 @@ class Agent:
         team: Team,
         map: Map,
         game_map: Map,
+        occupancy: Occupancy,
         position: Coords,
         map_price: int,
         move_range: int = 1,
+        rng: Optional[np.random.Generator] = None,
     ):
         self.move_range = move_range
+        self.vision_radius = team.vision_radius
         self.id = self.get_id()
         self.team = team
         self.tile_type = team.agent_tile
         self.game_map = game_map
+        self.occupancy = occupancy
         self.map = map
         self.map_price = map_price
+        # Stream of the random choices of this agent, independent of the
+        # other agents so that a change in one does not shift the others.
+        self.rng = np.random.default_rng() if rng is None else rng
 
         self.state = State.SEARCHING_FOR_RESOURCE
         self.energy_state = Energy.ENERGETIC
         self.collected_resource = Tiles.EMPTY
         self.target: Coords = team.village.center
-        self.visited_tiles: set[Coords] = set()
+        self.planner = PathPlanner(map, move_range)
         self.has_explore_target = False
 
+        # Generation of each teammate's map the last time this agent bought
+        # it, keyed by agent id, so later trades only carry what changed.
+        self.synced_generations: dict[int, int] = {}
+
         self.gold = 0
         self._energy = 100
         self._position = position
-        self._tile_standing_on = Tiles.EMPTY
-        self.print_map()
+        occupancy.place(self, position)
 
     @classmethod
     def get_id(cls) -> int:
@@ -166,42 +201,34 @@ class Agent:
 
     @position.setter
     def position(self, value: Coords):
-        for x in range(
-            self.position.x - self.move_range, self.position.x + self.move_range + 1
-        ):
-            if x < 0 or x >= self.map.width:
-                continue
-
-            for y in range(
-                self.position.y - self.move_range, self.position.y + self.move_range + 1
-            ):
-                if y < 0 or y >= self.map.height:
-                    continue
-
-                coords = Coords(x, y)
-                tile = self.game_map.get_tile(coords)
-
-                if tile in (Tiles.AGENT_1, Tiles.AGENT_2):
-                    continue
-
-                self.map.set_tile(coords, tile)
-
-        self.visited_tiles.add(value)
-        self.map.set_tile(self._position, self._tile_standing_on)
-        self.game_map.set_tile(self._position, self._tile_standing_on)
-        self._tile_standing_on = self.game_map.get_tile(value)
-        self.game_map.set_tile(value, self.tile_type)
+        self.occupancy.move(self._position, value)
         self._position = value
+        self.look_around()
+
+    def look_around(self):
+        """Copies the tiles within the vision radius from the game map into
+        the agent's map."""
+        x0 = max(self.position.x - self.vision_radius, 0)
+        y0 = max(self.position.y - self.vision_radius, 0)
+        seen = self.game_map.matrix[
+            x0 : self.position.x + self.vision_radius + 1,
+            y0 : self.position.y + self.vision_radius + 1,
+        ]
+        self.map.set_tiles(seen, origin=Coords(x0, y0))
 
     @property
     def tile(self) -> TileType:
-        return self.map.get_tile(self.position)
+        return self.game_map.get_tile(self.position)
 
     @tile.setter
     def tile(self, tile: TileType):
-        self._tile_standing_on = tile
+        self.game_map.set_tile(self.position, tile)
         self.map.set_tile(self.position, tile)
 
+    @property
+    def tile_code(self) -> int:
+        return self.game_map.get_code(self._position)
+
     @property
     def energy(self) -> int:
         return self._energy
@@ -215,36 +242,31 @@ class Agent:
         self.map.print(f"{self.id}_map.txt")
 
     def update(self):
-        LOGGER.info(f"updating agent {self.id} of team {self.team.id}")
+        LOGGER.debug("updating agent %s of team %s", self.id, self.team.id)
         if self.energy_state == Energy.EXCHAUSTED and self.state not in (
             State.GATHERING_ENERGY_POT,
             State.SEARCHING_FOR_ENERGY_POT,
         ):
             self.state = State.SEARCHING_FOR_ENERGY_POT
             LOGGER.info(
-                f"agent {self.id} searches for energy pot. energy: {self.energy}"
+                "agent %s searches for energy pot. energy: %s", self.id, self.energy
             )
 
-        if self.game_map.get_tile(self.position) == Tiles.GOLD:
+        if self.tile_code == Tiles.GOLD.index:
             self.pick_up_gold()
 
-        elif self.gold > self.map_price:
-            neighbor = self.get_neighboring_agent()
-
-            if neighbor is not None:
-                self.combine_maps(neighbor.map)
-                neighbor.gold += self.map_price
-                self.gold -= self.map_price
+        elif self.gold > self.map_price and self.trade_maps():
+            LOGGER.info("agent %s bought new tiles from a teammate", self.id)
 
         elif self.state == State.SEARCHING_FOR_ENERGY_POT:
-            LOGGER.info(
-                f"agent {self.id} searches for energy pot. energy: {self.energy}"
+            LOGGER.debug(
+                "agent %s searches for energy pot. energy: %s", self.id, self.energy
             )
             if self.locate_energy_pot():
-                LOGGER.info(f"agent {self.id} is on his way to collect energy pot")
+                LOGGER.info("agent %s is on his way to collect energy pot", self.id)
             elif not self.has_explore_target:
                 self.set_explore_target()
-                LOGGER.info(f"agent {self.id} is exploring")
+                LOGGER.info("agent %s is exploring", self.id)
 
             self.move_to_target()
         elif self.state == State.GATHERING_ENERGY_POT:
@@ -267,26 +289,15 @@ class Agent:
         self.energy -= 1
 
     def get_neighboring_agent(self) -> Optional[Agent]:
-        for x in range(self.position.x - 1, self.position.x + 2):
-            if x < 0 or x >= self.map.width:
-                continue
-
-            for y in range(self.position.y - 1, self.position.y + 2):
-                if y < 0 or y >= self.map.height:
-                    continue
-
-                coords = Coords(x, y)
-                if (
-                    coords != self.position
-                    and self.game_map.get_tile(coords) == self.team.agent_tile
-                ):
-                    for agent in self.team.agents:
-                        if agent.position == coords:
-                            return agent
+        for agent in self.occupancy.neighbors(self.position):
+            if agent.team is self.team:
+                return agent
+        return None
 
     def gather_energy_pot(self):
         if self.position == self.target:
-            if self._tile_standing_on != Tiles.ENERGY_POT:
+            if self.tile_code != Tiles.ENERGY_POT.index:
+                self.team.reservations.release(self.id)
                 self.state = State.SEARCHING_FOR_ENERGY_POT
                 return
 
@@ -305,29 +316,34 @@ class Agent:
         return located_energy_pot
 
     def locate_tile(self, tile_to_locate: TileType) -> bool:
-        for pos in self.map.positions:
-            tile = self.map.get_tile(pos)
-            if tile == tile_to_locate:
-                self.has_explore_target = False
-                self.target = pos
-                self.team.targets.append(pos)
-                return True
-        return False
+        pos = self.map.nearest([tile_to_locate], self.position, self.team.reservations)
+        if pos is None:
+            return False
+
+        self.has_explore_target = False
+        self.target = pos
+        self.team.reservations.reserve(pos, self.id)
+        return True
 
     def locate_resource(self) -> bool:
-        for pos in self.map.positions:
-            tile = self.map.get_tile(pos)
-            if self.team.resources.is_needed(tile) and pos not in self.team.targets:
-                self.target = pos
-                self.team.targets.append(pos)
-                self.has_explore_target = False
-                self.state = State.GATHERING_RESOURCE
-                return True
-        return False
+        pos = self.map.nearest(
+            self.team.resources.wanted_codes,
+            self.position,
+            self.team.reservations,
+        )
+        if pos is None:
+            return False
+
+        self.target = pos
+        self.team.reservations.reserve(pos, self.id)
+        self.has_explore_target = False
+        self.state = State.GATHERING_RESOURCE
+        return True
 
     def gather_resource(self):
         if self.position == self.target:
-            if not self.team.resources.is_needed(self._tile_standing_on):
+            if not self.team.resources.is_needed(self.tile_code):
+                self.team.reservations.release(self.id)
                 self.state = State.SEARCHING_FOR_RESOURCE
                 return
 
@@ -336,105 +352,153 @@ class Agent:
             self.move_to_target()
 
     def store_resource(self):
-        if self.tile == self.team.village.tile:
-            LOGGER.info(f"agent {self.id} stored resource {self.collected_resource}")
+        if self.tile_code == self.team.village.tile.index:
+            LOGGER.info(
+                "agent %s stored resource %s", self.id, self.collected_resource.name
+            )
             self.team.resources.add(self.collected_resource)
             self.collected_resource = Tiles.EMPTY
             self.state = State.SEARCHING_FOR_RESOURCE
             self.locate_resource()
         else:
-            self.move_to_target()
+            self.move_to_village()
 
     def move_to_target(self):
-        scores = []
-        for x in range(
-            self.position.x - self.move_range, self.position.x + self.move_range + 1
-        ):
-            if x < 0 or x >= self.map.width:
-                continue
-
-            for y in range(
-                self.position.y - self.move_range, self.position.y + self.move_range + 1
-            ):
-                if y < 0 or y >= self.map.height:
-                    continue
-
-                score = abs(self.target.x - x) + abs(self.target.y - y)
-                coords = Coords(x, y)
-                scores.append((coords, score))
-
-        scores.sort(key=lambda entry: entry[1])
-        for hop_coords, _ in scores:
-            curr_tile = self.game_map.get_tile(hop_coords)
-            is_hope_target_agent = curr_tile in (Tiles.AGENT_1, Tiles.AGENT_2)
-            if hop_coords in self.visited_tiles or is_hope_target_agent:
-                continue
-
-            LOGGER.info(f"agent {self.id} moved from {self.position} to {hop_coords}")
-            self.position = hop_coords
+        hop_coords = self.planner.next_step(self.position, self.target, self.is_blocked)
+        if hop_coords is None:
             return
 
-        self.visited_tiles.clear()
+        LOGGER.debug("agent %s moved from %s to %s", self.id, self.position, hop_coords)
+        self.position = hop_coords
+        self.planner.advance()
+
+    def move_to_village(self):
+        assert self.team.village_field is not None
+        hop_coords = self.team.village_field.next_step(
+            self.position, self.move_range, self.is_blocked
+        )
+        if hop_coords is None:
+            return
+
+        LOGGER.debug("agent %s moved from %s to %s", self.id, self.position, hop_coords)
+        self.position = hop_coords
+
+    def is_blocked(self, pos: Coords) -> bool:
+        # Only agents within reach are obstacles, the ones further away will
+        # likely have moved by the time this agent gets there.
+        is_near = (
+            abs(pos.x - self.position.x) <= self.move_range
+            and abs(pos.y - self.position.y) <= self.move_range
+        )
+        return is_near and self.occupancy.is_occupied(pos)
 
     def pick_up_energy_pot(self):
-        LOGGER.info(f"agent {self.id} picked up energy pot")
+        LOGGER.info("agent %s picked up energy pot", self.id)
         self.tile = Tiles.EMPTY
+        self.team.reservations.release(self.id)
         new_energy_bar = self._energy + self.team.config.energy_pots_energy
         self._energy = min(new_energy_bar, 100)
-        self.visited_tiles.clear()
 
     def pick_up_gold(self):
-        LOGGER.info(f"agent {self.id} picked up gold")
+        LOGGER.info("agent %s picked up gold", self.id)
         self.tile = Tiles.EMPTY
         self.gold += 1
 
     def pick_up_resource(self):
-        LOGGER.info(f"agent {self.id} picked up resource {self.tile.name}")
+        if LOGGER.isEnabledFor(logging.INFO):
+            LOGGER.info("agent %s picked up resource %s", self.id, self.tile.name)
         self.collected_resource = self.tile
         self.tile = Tiles.EMPTY
-        self.visited_tiles.clear()
-        self.locate_tile(self.team.village.tile)
-        self.team.targets.remove(self.position)
+        self.team.reservations.release(self.id)
         self.state = State.STORING_RESOURCE
 
     def buy_energy_pot(self):
-        LOGGER.info(f"agent {self.id} bought energy pot")
+        LOGGER.info("agent %s bought energy pot", self.id)
         self.gold -= self.team.config.energy_pot_price
         new_energy_bar = self._energy + self.team.config.energy_pots_energy
         self._energy = min(new_energy_bar, 100)
-        self.visited_tiles.clear()
 
     def buy_map(self, map: Map):
-        LOGGER.info(f"agent {self.id} bought a map")
+        LOGGER.info("agent %s bought a map", self.id)
         self.gold -= self.team.config.map_price
-        for pos in self.map.positions:
-            tile = self.map.get_tile(pos)
-            if tile == Tiles.UNKNOWN:
-                tile_to_set = map.get_tile(pos)
-                self.map.set_tile(pos, tile_to_set)
-
-            if map.get_tile(pos) == Tiles.EMPTY:
-                self.map.set_tile(pos, Tiles.EMPTY)
+        unknown = self.map.matrix == Tiles.UNKNOWN.index
+        bought = np.where(unknown, map.matrix, self.map.matrix)
+        bought[map.matrix == Tiles.EMPTY.index] = Tiles.EMPTY.index
+        self.map.set_tiles(bought)
 
     def set_explore_target(self):
-        unknown_block_index = randint(0, self.map.size - 1)
-        unknown_blocks_positions = []
+        frontier = self.map.frontier
+        if (
+            self.has_explore_target
+            and self.target in frontier
+            and self.target != self.position
+        ):
+            return
 
-        for pos in self.map.positions:
-            if self.map.get_tile(pos) == Tiles.UNKNOWN:
-                unknown_blocks_positions.append(pos)
+        # The closest frontier cells, then the ones that reveal the most
+        # unknown cells, then a random one.
+        candidates = [pos for pos in frontier if pos != self.position]
+        if not candidates:
+            self.has_explore_target = False
+            return
 
-            if len(unknown_blocks_positions) > unknown_block_index:
-                self.target = pos
-                self.has_explore_target = True
-                return
+        def distance(pos: Coords) -> int:
+            return max(abs(pos.x - self.position.x), abs(pos.y - self.position.y))
+
+        closest = min(map(distance, candidates))
+        candidates = [pos for pos in candidates if distance(pos) == closest]
+
+        def gain(pos: Coords) -> int:
+            return self.map.count_unknown_around(pos, self.vision_radius)
+
+        most_gain = max(map(gain, candidates))
+        candidates = [pos for pos in candidates if gain(pos) == most_gain]
+        candidates.sort(key=lambda pos: (pos.x, pos.y))
 
-        random_unknown_block_index = unknown_block_index % len(unknown_blocks_positions)
-        self.target = unknown_blocks_positions[random_unknown_block_index]
+        self.team.reservations.release(self.id)
+        self.target = candidates[int(self.rng.integers(len(candidates)))]
         self.has_explore_target = True
 
-    def combine_maps(self, map: Map):
-        for pos in self.map.positions:
-            new_tile = map.get_tile(pos)
-            if self.map.get_tile(pos) == Tiles.UNKNOWN and new_tile != Tiles.UNKNOWN:
-                self.map.set_tile(pos, new_tile)
+    def trade_maps(self) -> bool:
+        """Buys the tiles a neighboring teammate learned since the two last
+        traded. Returns False, without paying, if there is no neighbor or it
+        has nothing new to sell."""
+        neighbor = self.get_neighboring_agent()
+        if neighbor is None:
+            return False
+
+        since = self.synced_generations.get(neighbor.id)
+        if since == neighbor.map.generation:
+            return False
+
+        self.synced_generations[neighbor.id] = neighbor.map.generation
+        if not self.combine_maps(neighbor.map, since):
+            return False
+
+        neighbor.gold += self.map_price
+        self.gold -= self.map_price
+        return True
+
+    def combine_maps(self, map: Map, since: Optional[int] = None) -> bool:
+        """Copies the tiles known on `map` but unknown to the agent. If `since`
+        is given, only the tiles that changed on `map` after that generation
+        are considered. Returns whether any tile was copied."""
+        new_tiles = map.known & ~self.map.known
+        if since is not None:
+            new_tiles &= map.changed_since(since)
+        if not new_tiles.any():
+            return False
+
+        self.map.set_tiles(map.matrix, where=new_tiles)
+        return True
+
+
+profiling.hook(Agent, "update", "agent.update", label=lambda agent: agent.state)
+profiling.hook(Agent, "position", "agent.position")
+profiling.hook(Agent, "look_around", "agent.vision")
+profiling.hook(Agent, "locate_resource", "agent.locate_resource")
+profiling.hook(Agent, "locate_tile", "agent.locate_tile")
+profiling.hook(Agent, "set_explore_target", "agent.set_explore_target")
+profiling.hook(Agent, "move_to_target", "agent.move_to_target")
+profiling.hook(Agent, "move_to_village", "agent.move_to_village")
+profiling.hook(Agent, "trade_maps", "agent.trade_maps")
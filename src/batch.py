@@ -0,0 +1,170 @@
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Iterable, Iterator, Optional
+
+from .config import GameConfig, load_config
+from .logger import configure_logging
+from .map_cache import configure_map_cache
+from .simulation import DEFAULT_MAX_ROUNDS, Simulation
+
+# State of a pool worker. It is set once by `_init_worker`, so every game a
+# worker plays reuses the already imported modules and the config.
+_WORKER_CONFIG: Optional[GameConfig] = None
+_WORKER_MAX_ROUNDS = DEFAULT_MAX_ROUNDS
+
+
+@dataclass(frozen=True)
+class GameResult:
+    seed: int
+    winner: Optional[int]
+    rounds: int
+    resources: list[dict[str, int]]
+    # State hash at the end of the game, equal across code changes that
+    # keep the game the same.
+    state_hash: int
+
+
+@dataclass(frozen=True)
+class BatchSummary:
+    games: int
+    # Win rate per team index, in the order the teams appear in the config.
+    win_rates: list[float]
+    draw_rate: float
+    rounds_min: int
+    rounds_max: int
+    rounds_mean: float
+    rounds_median: float
+    rounds_stdev: float
+    # Number of games per round bucket, keyed by the bucket's lower bound.
+    rounds_histogram: dict[int, int]
+
+
+def _init_worker(
+    config: GameConfig,
+    max_rounds: int,
+    log: Optional[str],
+    map_cache: Optional[str],
+):
+    global _WORKER_CONFIG, _WORKER_MAX_ROUNDS
+    configure_map_cache(map_cache)
+    if log is not None:
+        # Every worker writes its own file, the writer thread of one
+        # process cannot be shared with the others.
+        configure_logging(f"{log}.{os.getpid()}")
+    _WORKER_CONFIG = config
+    _WORKER_MAX_ROUNDS = max_rounds
+
+
+def _play(seed: int) -> GameResult:
+    assert _WORKER_CONFIG is not None, "worker was not initialized"
+    simulation = Simulation(_WORKER_CONFIG, seed)
+    result = simulation.run(_WORKER_MAX_ROUNDS)
+    return GameResult(
+        seed,
+        result.winner,
+        result.rounds,
+        result.resources,
+        simulation.state_hash(),
+    )
+
+
+def run_batch(
+    config: GameConfig,
+    seeds: Iterable[int],
+    processes: Optional[int] = None,
+    max_rounds: int = DEFAULT_MAX_ROUNDS,
+    log: Optional[str] = None,
+    map_cache: Optional[str] = None,
+) -> Iterator[GameResult]:
+    """Plays one game per seed on a process pool and yields the results in
+    the order they finish. The config is loaded by the caller, since a
+    worker that fails to start is replaced by the pool over and over."""
+    with multiprocessing.Pool(
+        processes,
+        initializer=_init_worker,
+        initargs=(config, max_rounds, log, map_cache),
+    ) as pool:
+        yield from pool.imap_unordered(_play, seeds)
+
+
+def summarize(results: list[GameResult], histogram_bins: int = 10) -> BatchSummary:
+    if not results:
+        raise ValueError("Cannot summarize an empty batch.")
+
+    games = len(results)
+    teams = len(results[0].resources)
+    wins = Counter(result.winner for result in results)
+    rounds = [result.rounds for result in results]
+
+    low, high = min(rounds), max(rounds)
+    bin_width = max(1, -(-(high - low + 1) // histogram_bins))
+    histogram = Counter(low + (r - low) // bin_width * bin_width for r in rounds)
+
+    return BatchSummary(
+        games=games,
+        win_rates=[wins[team] / games for team in range(teams)],
+        draw_rate=wins[None] / games,
+        rounds_min=low,
+        rounds_max=high,
+        rounds_mean=statistics.fmean(rounds),
+        rounds_median=statistics.median(rounds),
+        rounds_stdev=statistics.pstdev(rounds),
+        rounds_histogram=dict(sorted(histogram.items())),
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Play many headless games")
+    parser.add_argument("config", help="configuration file")
+    parser.add_argument("games", type=int, help="number of games (seeds) to play")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count(),
+        help="number of worker processes, defaults to the number of cores",
+    )
+    parser.add_argument("--max-rounds", type=int, default=DEFAULT_MAX_ROUNDS)
+    parser.add_argument(
+        "--log",
+        help="prefix of the log files of the workers, logging is off if not set",
+    )
+    parser.add_argument(
+        "--map-cache",
+        help="directory of generated maps, shared by the workers and batches",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="only print the summary, not every game result",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    seeds = range(args.first_seed, args.first_seed + args.games)
+
+    results = []
+    for result in run_batch(
+        load_config(args.config),
+        seeds,
+        args.processes,
+        args.max_rounds,
+        args.log,
+        args.map_cache,
+    ):
+        results.append(result)
+        if not args.quiet:
+            print(json.dumps(asdict(result)), flush=True)
+
+    print(json.dumps(asdict(summarize(results)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Checkpoints of the whole state of a game, from which it can be resumed
+exactly as if it had never stopped: the maps, the agents and teams, the
+reservations and the random generators. A checkpoint is a pickle of the
+engine after a small header, optionally compressed with zlib.
+
+Checkpoints are only meant to be loaded by the same version of the code and
+must not be loaded from untrusted sources, like any pickle.
+"""
+
+import io
+import pickle
+import zlib
+from typing import Union
+
+from .simulation import Simulation
+from .swarm import Swarm
+from .tiles import Tiles
+
+FORMAT_VERSION = 1
+
+Engine = Union[Simulation, Swarm]
+
+
+def dumps(game: Engine, compressed: bool = False) -> bytes:
+    # The header is read first so that the tile types of the teams exist
+    # before the engine that refers to them is unpickled.
+    header = {"version": FORMAT_VERSION, "teams": len(game.config.teams)}
+    buffer = io.BytesIO()
+    pickle.dump(header, buffer, protocol=pickle.HIGHEST_PROTOCOL)
+    pickle.dump(game, buffer, protocol=pickle.HIGHEST_PROTOCOL)
+    data = buffer.getvalue()
+    return zlib.compress(data, 1) if compressed else data
+
+
+def loads(data: bytes) -> Engine:
+    if data[:1] != b"\x80":
+        # Pickles start with the PROTO opcode, anything else is compressed.
+        data = zlib.decompress(data)
+
+    buffer = io.BytesIO(data)
+    header = pickle.load(buffer)
+    if header["version"] != FORMAT_VERSION:
+        raise ValueError(
+            f"Checkpoint format {header['version']} is not supported, "
+            f"expected {FORMAT_VERSION}."
+        )
+    Tiles.team_tiles(header["teams"] - 1)
+    return pickle.load(buffer)
+
+
+def save_checkpoint(path: str, game: Engine, compressed: bool = False):
+    with open(path, "wb") as f:
+        f.write(dumps(game, compressed))
+
+
+def load_checkpoint(path: str) -> Engine:
+    with open(path, "rb") as f:
+        return loads(f.read())
@@ -1,10 +1,38 @@
-from dataclasses import dataclass
+import os
+from dataclasses import dataclass, field
+from typing import Optional
 
 import toml
 
+# Keys of a team table that are parameters of the team. The other keys are
+# the resources the team has to collect.
+TEAM_PARAMETERS = ("agents", "move_range", "vision_radius")
+
+
+@dataclass
+class TeamConfig:
+    # Resources to collect, by name.
+    resources: dict[str, int]
+    agents: int
+    move_range: int = 1
+    # How far the agents see around them. Defaults to their move range.
+    vision_radius: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, table: dict, defaults: dict) -> "TeamConfig":
+        """Builds a team from its config table, taking the parameters it does
+        not set from `defaults`."""
+        parameters = {
+            **defaults,
+            **{k: table[k] for k in TEAM_PARAMETERS if k in table},
+        }
+        resources = {k: v for k, v in table.items() if k not in TEAM_PARAMETERS}
+        return cls(resources, **parameters)
+
 
 @dataclass
 class GameConfig:
+    # Agents per team, unless a team sets its own.
     agents: int
     energy_pots: int
     energy_pots_energy: int
@@ -13,15 +41,58 @@ class GameConfig:
     map_price: int
     width: int
     height: int
-    team1: dict
-    team2: dict
     resources: dict
+    # One table per team. Configs written for two teams may use the `team1`
+    # and `team2` tables instead.
+    teams: list[TeamConfig] = field(default_factory=list)
+    team1: Optional[dict] = None
+    team2: Optional[dict] = None
+    # How far agents see around them. Defaults to their move range.
+    vision_radius: Optional[int] = None
+    # Seed of the games played with this config, random if not set.
+    seed: Optional[int] = None
+    # Map file to play on instead of generating one, a `.npy` array of tile
+    # indices or a text map like `gamemap.txt`. Its villages set where the
+    # teams live.
+    map: Optional[str] = None
+
+    def __post_init__(self):
+        tables: list = list(self.teams)
+        if not tables and self.team1 is not None and self.team2 is not None:
+            # The second team has always moved two cells at a time.
+            tables = [self.team1, {"move_range": 2, **self.team2}]
+        if not tables:
+            raise ValueError("At least one team must be declared.")
+
+        defaults = {"agents": self.agents, "vision_radius": self.vision_radius}
+        self.teams = [
+            (
+                table
+                if isinstance(table, TeamConfig)
+                else TeamConfig.from_dict(table, defaults)
+            )
+            for table in tables
+        ]
 
 
-def load_config(filepath: str) -> GameConfig:
+def load_config(filepath: str, max_agents: Optional[int] = 10) -> GameConfig:
+    """Loads a config file. `max_agents` caps the number of agents per team,
+    None lifts the cap for engines that are not limited by the viewer. The
+    `[benchmark]` table of the benchmark scenarios is not part of the game
+    and is ignored."""
     with open(filepath, "r") as f:
-        config = GameConfig(**toml.load(f))
-        if config.agents not in range(1, 11):
-            raise ValueError("Number of agents must be between between 1 and 10.")
+        data = toml.load(f)
+        data.pop("benchmark", None)
+        config = GameConfig(**data)
+        if config.map is not None:
+            # Relative to the config file, not to where the game is run.
+            config.map = os.path.join(os.path.dirname(filepath), config.map)
+        for team in config.teams:
+            if team.agents < 1:
+                raise ValueError("Number of agents must be at least 1.")
+            if max_agents is not None and team.agents > max_agents:
+                raise ValueError(
+                    f"Number of agents must be between between 1 and {max_agents}."
+                )
 
         return config
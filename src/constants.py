@@ -21,6 +21,12 @@ WINDOW_HEIGHT = 1200
 WINDOW_PADDING = 10
 BOARD_PADDING = 0
 
+# Frames drawn per second, one simulation tick per frame at normal speed
+FRAME_RATE = 60
+# Frames in a row that may skip refreshing the board while the simulation
+# cannot keep up with its speed
+MAX_SKIPPED_FRAMES = 10
+
 MENU_HEIGHT = 80
 MENU_WIDTH = WINDOW_WIDTH - 2 * WINDOW_PADDING
 MENU_PADDING = 10
@@ -1,17 +1,31 @@
-from itertools import product
-from typing import Literal
+import time
+from typing import Optional
 
 import arcade
 
-from .agent import ResourcePile, Team, Village
+from . import checkpoint, profiling
 from .config import GameConfig
-from .constants import MENU_HEIGHT, MENU_PADDING, WINDOW_PADDING, colors
-from .game_map import GameMap
+from .constants import (
+    FRAME_RATE,
+    MAX_SKIPPED_FRAMES,
+    MENU_HEIGHT,
+    MENU_PADDING,
+    WINDOW_PADDING,
+    colors,
+)
 from .logger import LOGGER
 from .menu import Menu
-from .tile import Tile
-from .tiles import Tiles
-from .types import Coords
+from .simulation import Simulation
+from .tile import Board, Tile
+
+# Ticks per frame selected by the speed keys, None runs as many ticks as fit
+# in a frame.
+SPEED_KEYS: dict[int, Optional[int]] = {
+    arcade.key.Z: 1,
+    arcade.key.X: 10,
+    arcade.key.C: 100,
+    arcade.key.V: None,
+}
 
 
 class Game(arcade.Window):
@@ -21,18 +35,30 @@ class Game(arcade.Window):
         height: int,
         title: str,
         game_config: GameConfig,
+        simulation: Optional[Simulation] = None,
     ):
         super().__init__(
             width=width,
             height=height + MENU_HEIGHT,
             title=title,
             samples=16,
+            update_rate=1 / FRAME_RATE,
+            draw_rate=1 / FRAME_RATE,
+        )
+        # The board is as many tiles across as the matrix has rows.
+        Tile.height = (height - 2 * WINDOW_PADDING) / max(
+            game_config.height, game_config.width
         )
-        Tile.height = (height - 2 * WINDOW_PADDING) / game_config.height
         Tile.width = Tile.height
 
         self.is_paused = False
         self.game_config = game_config
+        self.ticks_per_frame: Optional[int] = 1
+        # Ticks owed to the simulation, it runs at a fixed number of ticks
+        # per second however late the frames come.
+        self.pending_ticks = 0.0
+        self.is_behind = False
+        self.skipped_frames = 0
 
         menu_center = (
             width / 2,
@@ -41,108 +67,80 @@ class Game(arcade.Window):
         self.menu = Menu(menu_center, colors.WHITE_SMOKE, width, MENU_HEIGHT)
         self.background_color = colors.LICORICE
 
-        self.initialize(game_config)
-        self.setup(game_config.width)
-
-    def reset(self):
-        self.initialize(self.game_config)
-        self.setup(self.game_config.width)
-
-    def setup(self, size: int):
-        self.round = 1
-        # A list with all the default tile shapes and the menu shape. Its
-        # used to speed up the rendering of board in its default state,
-        # meaning when all the tiles are owned by nature. So when a tile
-        # is owned by nature, we don't have to explicitly render it by
-        # adding it to the tiles_to_render list.
-        self.shapes_list = arcade.shape_list.ShapeElementList()
-
-        # A list with all the valid tile coordinates, meaning from (0, 0),
-        # (0, 1) ... (BOARD_SIZE, BOARD_SIZE)
-        tile_coords = [Coords(*i) for i in product(range(size), repeat=2)]
-        # A list that countains all of the tile instances. In this case, hexagons.
-        self.tiles = [Tile(i, Tiles.EMPTY) for i in tile_coords]
-
-        # Populate the shape list with the default tile shapes.
-        for tile in self.tiles:
-            self.shapes_list.append(tile.shape)
-
-    def initialize(self, config: GameConfig):
-        LOGGER.info(f"Creating resource piles...")
-        team1_resources = ResourcePile(**config.team1)
-        team2_resources = ResourcePile(**config.team2)
-
-        village1_center = Coords(
-            (config.width * 3) // 10,
-            (config.height * 3) // 10,
-        )
-
-        village2_center = Coords(
-            (config.width * 7) // 10,
-            (config.height * 7) // 10,
-        )
-
-        LOGGER.info(f"Center of village 1: {village1_center}")
-        LOGGER.info(f"Center of village 2: {village2_center}")
-
-        LOGGER.info(f"Creating villages...")
-        village1 = Village(village1_center, Tiles.VILLAGE_1)
-        village2 = Village(village2_center, Tiles.VILLAGE_2)
-
-        LOGGER.info(f"Creating map...")
-        self.map = GameMap(
-            config.width,
-            config.height,
-            config.resources["wood"],
-            config.resources["wheat"],
-            config.resources["iron"],
-            config.golds,
-            config.energy_pots,
-            [village1, village2],
-            config.agents,
-        )
+        self.board: Optional[Board] = None
+        self.start(simulation or Simulation(game_config))
+
+    def start(self, simulation: Simulation):
+        self.show(simulation)
+        # Restart goes back to the first round shown, and loading goes back
+        # to the last checkpoint taken, without generating anything.
+        self.start_checkpoint = checkpoint.dumps(simulation)
+        self.last_checkpoint = self.start_checkpoint
+
+    def show(self, simulation: Simulation):
+        """Shows `simulation` from its current round. The board is kept if
+        the map has the same size, so only the tiles that differ change."""
+        self.simulation = simulation
+        self.map = simulation.map
+        self.teams = simulation.teams
         self.map_to_show = self.map.matrix
-        self.selected_team: Literal[0, 1] = 0
+        self.selected_team = 0
         self.selected_agent_num = 0
-
-        LOGGER.info(f"Creating teams...")
-        team1 = Team(village1, team1_resources, Tiles.AGENT_1, config)
-        team2 = Team(village2, team2_resources, Tiles.AGENT_2, config)
-        self.teams = [team1, team2]
-
-        LOGGER.info(f"Creating agents...")
-        for team in self.teams:
-            self.map.generate_players(team, config.agents, config.map_price)
-
-        self.map.print_map()
+        self.pending_ticks = 0.0
+        self.is_behind = False
+        self.skipped_frames = 0
+        if self.board is None or self.board.shape != self.map.matrix.shape:
+            self.board = Board(*self.map.matrix.shape)
 
     def on_update(self, delta_time: float):
         if self.is_paused:
             return
 
-        for team in self.teams:
-            for agent in team.agents:
-                agent.update()
+        # The simulation gets at most a frame's worth of time, whatever is
+        # left over is dropped and the board is not refreshed for it.
+        deadline = time.perf_counter() + 1 / FRAME_RATE
+        if self.ticks_per_frame is None:
+            due = None
+        else:
+            self.pending_ticks += delta_time * FRAME_RATE * self.ticks_per_frame
+            due = int(self.pending_ticks)
+            self.pending_ticks -= due
+
+        ticks = 0
+        while due is None or ticks < due:
+            self.simulation.step()
+            ticks += 1
+            if self.simulation.is_finished or time.perf_counter() >= deadline:
+                break
+
+        # A win cuts the ticks short without the simulation falling behind.
+        self.is_behind = (
+            due is not None and ticks < due and not self.simulation.is_finished
+        )
+        if self.is_behind:
+            self.pending_ticks = 0.0
 
-        for team in self.teams:
-            if not team.resources.wanted_resources:
-                LOGGER.info(f"Team {team.id} Won!")
-                exit()
+        if self.simulation.is_finished:
+            self.pause()
 
     def on_draw(self):
-        for tile, tile_index in zip(self.tiles, self.map_to_show.flat):
-            tile.set_tile_type(Tiles.get(tile_index))
+        # Refreshing the board is what a frame costs, the frames the
+        # simulation falls behind in redraw the last board instead.
+        if self.is_behind and self.skipped_frames < MAX_SKIPPED_FRAMES:
+            self.skipped_frames += 1
+        else:
+            self.skipped_frames = 0
+            shown = self.map_to_show
+            if shown is self.map.matrix:
+                shown = self.simulation.occupancy.overlay(shown)
+            self.board.update(shown)
 
         self.clear()
-        self.shapes_list.draw()
-
-        for tile in self.tiles:
-            tile.render()
-
+        self.board.draw()
         self.menu.render(
-            self.teams[0].resources.get_resourse_repr(),
-            self.teams[1].resources.get_resourse_repr(),
-            self.round,
+            [team.resources.get_resourse_repr() for team in self.teams],
+            self.simulation.round,
+            self.speed,
         )
 
     def on_key_press(self, symbol: int, modifiers: int):
@@ -166,9 +164,17 @@ class Game(arcade.Window):
                 self.resume()
             case arcade.key.R:
                 self.restart()
+            case arcade.key.N:
+                self.new_game()
+            case arcade.key.K:
+                self.take_checkpoint()
+            case arcade.key.L:
+                self.load_checkpoint()
+            case symbol if symbol in SPEED_KEYS:
+                self.set_speed(SPEED_KEYS[symbol])
             case symbol if symbol in numbers_mapper.keys():
                 selected_agent_num = numbers_mapper[symbol]
-                if selected_agent_num >= self.game_config.agents:
+                if selected_agent_num >= len(self.teams[self.selected_team].agents):
                     return
 
                 self.selected_agent_num = selected_agent_num
@@ -177,17 +183,34 @@ class Game(arcade.Window):
             case arcade.key.ENTER:
                 self.map_to_show = self.map.matrix
             case arcade.key.MINUS:
-                self.selected_team = 0
-                agent = self.teams[self.selected_team].agents[self.selected_agent_num]
-                self.map_to_show = agent.map.matrix
+                self.select_team(self.selected_team - 1)
             case arcade.key.EQUAL:
-                self.selected_team = 1
-                agent = self.teams[self.selected_team].agents[self.selected_agent_num]
-                self.map_to_show = agent.map.matrix
+                self.select_team(self.selected_team + 1)
+
+    def select_team(self, team: int):
+        """Shows the map of the selected agent of the team with index `team`,
+        wrapping around the list of teams."""
+        self.selected_team = team % len(self.teams)
+        agents = self.teams[self.selected_team].agents
+        self.selected_agent_num = min(self.selected_agent_num, len(agents) - 1)
+        self.map_to_show = agents[self.selected_agent_num].map.matrix
+
+    @property
+    def speed(self) -> str:
+        return "max" if self.ticks_per_frame is None else f"x{self.ticks_per_frame}"
+
+    def set_speed(self, ticks_per_frame: Optional[int]):
+        LOGGER.info("GAME SPEED %s", ticks_per_frame)
+        self.ticks_per_frame = ticks_per_frame
+        self.pending_ticks = 0.0
 
     def pause(self):
         LOGGER.info("GAME PAUSED")
         self.is_paused = True
+        # The next frames show the board as it is now, even if the last
+        # update fell behind.
+        self.is_behind = False
+        self.skipped_frames = 0
 
     def resume(self):
         LOGGER.info("GAME RESUMED")
@@ -196,4 +219,21 @@ class Game(arcade.Window):
     def restart(self):
         LOGGER.info("GAME RESTARTED")
         self.is_paused = False
-        self.reset()
+        self.show(checkpoint.loads(self.start_checkpoint))
+
+    def new_game(self):
+        LOGGER.info("NEW GAME")
+        self.is_paused = False
+        self.start(Simulation(self.game_config))
+
+    def take_checkpoint(self):
+        LOGGER.info("CHECKPOINT AT ROUND %s", self.simulation.round)
+        self.last_checkpoint = checkpoint.dumps(self.simulation)
+
+    def load_checkpoint(self):
+        LOGGER.info("CHECKPOINT LOADED")
+        self.show(checkpoint.loads(self.last_checkpoint))
+
+
+profiling.hook(Game, "on_update", "game.on_update")
+profiling.hook(Game, "on_draw", "game.on_draw")
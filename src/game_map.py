@@ -1,12 +1,12 @@
 import math
-import random
-from math import floor
+from typing import Optional
 
 import numpy as np
 
 from .agent import Agent, Team, Village
-from .map import Map
-from .tiles import Tiles, TileType
+from .map import Map, read_text, write_text
+from .occupancy import Occupancy
+from .tiles import Tiles
 from .types import Coords
 
 
@@ -23,105 +23,176 @@ class GameMap(Map):
         gold: int,
         energy_pots: int,
         villages: list[Village],
-        num_of_players: int,
+        num_of_players: list[int],
+        rng: Optional[np.random.Generator] = None,
     ):
-        matrix = np.zeros((height, width), dtype=int)
-        super().__init__(matrix)
+        self.rng = np.random.default_rng() if rng is None else rng
         self.village_radius = math.floor(0.1 * height)
 
-        for village in villages:
-            self.generate_village(village, num_of_players)
-
-        self.generate_resources(wood, iron, wheat)
-        self.generate_gold(gold)
-        self.generate_energy_pots(energy_pots)
-
-    def get_variance(self) -> int:
-        return random.randint(-(self.variance // 2), self.variance // 2)
+        # The whole terrain is generated on the matrix first, so that the
+        # index of the map is built once from the result.
+        matrix = np.full((height, width), Tiles.EMPTY.index, dtype=int)
+        for village, players in zip(villages, num_of_players):
+            self.generate_village(matrix, village, players)
+
+        size = height * width
+        self.scatter_tiles(
+            matrix,
+            {
+                Tiles.WOOD.index: (wood * size) // 100,
+                Tiles.IRON.index: (iron * size) // 100,
+                Tiles.WHEAT.index: (wheat * size) // 100,
+                Tiles.GOLD.index: gold,
+                Tiles.ENERGY_POT.index: energy_pots,
+            },
+        )
 
-    def generate_players(self, team: Team, num_of_players: int, map_price: int):
+        super().__init__(matrix)
+        self.occupancy = Occupancy(height, width)
+
+    @classmethod
+    def from_matrix(
+        cls, matrix: np.ndarray, rng: Optional[np.random.Generator] = None
+    ) -> "GameMap":
+        """Builds a game map on a terrain that was generated before, a matrix
+        of tile indices. Agent tiles are cleared, the game places its own."""
+        terrain = np.array(matrix, dtype=int)
+        if terrain.ndim != 2:
+            raise ValueError(f"A map must be 2D, not of shape {terrain.shape}.")
+        if terrain.min() < 0 or terrain.max() >= len(Tiles.registry):
+            raise ValueError("The map holds indices of unknown tile types.")
+        if np.isin(terrain, [Tiles.UNKNOWN.index, Tiles.INVALID.index]).any():
+            raise ValueError("A game map cannot hold unknown or invalid tiles.")
+        terrain[np.isin(terrain, [t.index for t in Tiles.agents])] = Tiles.EMPTY.index
+
+        game_map = cls.__new__(cls)
+        game_map.rng = np.random.default_rng() if rng is None else rng
+        game_map.village_radius = math.floor(0.1 * terrain.shape[0])
+        Map.__init__(game_map, terrain)
+        game_map.occupancy = Occupancy(*terrain.shape)
+        return game_map
+
+    @classmethod
+    def from_file(
+        cls, path: str, rng: Optional[np.random.Generator] = None
+    ) -> "GameMap":
+        """Loads a map saved by `save`, a `.npy` array of tile indices or a
+        text map like `gamemap.txt`."""
+        matrix = np.load(path) if path.endswith(".npy") else read_text(path)
+        return cls.from_matrix(matrix, rng)
+
+    def save(self, path: str):
+        """Saves the terrain, without the agents, as a `.npy` array if the
+        path ends with it and as a text map otherwise."""
+        if path.endswith(".npy"):
+            np.save(path, self.matrix.astype(np.int8))
+        else:
+            write_text(path, self.matrix)
+
+    def village_centers(self, teams: int) -> list[Coords]:
+        """Centers of the villages of the first `teams` teams, in the middle
+        of their village tiles."""
+        centers = []
+        for team in range(teams):
+            village_tile, _ = Tiles.team_tiles(team)
+            cells = np.argwhere(self.matrix == village_tile.index)
+            if len(cells) == 0:
+                raise ValueError(f"The map has no village for team {team + 1}.")
+            x, y = np.rint(cells.mean(axis=0)).astype(int).tolist()
+            centers.append(Coords(x, y))
+        return centers
+
+    def generate_players(
+        self,
+        team: Team,
+        num_of_players: int,
+        map_price: int,
+        seed: Optional[np.random.SeedSequence] = None,
+    ):
+        """Places the agents of `team` around its village. Every agent gets
+        its own random stream spawned from `seed`."""
+        seeds = (np.random.SeedSequence() if seed is None else seed).spawn(
+            num_of_players
+        )
         center = team.village.center
         radius = self.village_radius
+        occupied = self.occupancy.grid != Occupancy.FREE
+        positions = self.sample_free_cells(center, radius, num_of_players, occupied)
 
-        for _ in range(num_of_players):
-            position = self.get_unpopulated_tile_inside_village(center, radius)
-            self.set_tile(position, team.agent_tile)
-            agent_map = np.full(
-                [self.width, self.height], Tiles.UNKNOWN.index, dtype=np.int8
-            )
-
-            for pos in self.positions:
-                x_inside_village = center.x - radius <= pos.x <= center.x + radius
-                y_inside_village = center.y - radius <= pos.y <= center.y + radius
-                if x_inside_village and y_inside_village:
-                    agent_map[pos.x][pos.y] = self.matrix[pos.x][pos.y]
+        for (x, y), agent_seed in zip(positions.tolist(), seeds):
+            agent_map = np.full(self.matrix.shape, Tiles.UNKNOWN.index, dtype=np.int8)
 
-            move_range = 2 if team.agent_tile == Tiles.AGENT_2 else 1
-            agent = Agent(team, Map(agent_map), self, position, map_price, move_range)
+            village = (
+                slice(max(center.x - radius, 0), center.x + radius + 1),
+                slice(max(center.y - radius, 0), center.y + radius + 1),
+            )
+            agent_map[village] = self.matrix[village]
+
+            agent = Agent(
+                team,
+                Map(agent_map, track_frontier=True),
+                self,
+                self.occupancy,
+                Coords(x, y),
+                map_price,
+                team.move_range,
+                np.random.default_rng(agent_seed),
+            )
             team.agents.append(agent)
 
-    def get_unpopulated_tile_inside_village(
-        self, center: Coords, radius: int
-    ) -> Coords:
-        pos = center
-        iterations: int = 0
-        max_iterations_with_given_radius = 100
-
-        while self.get_tile(pos) != Tiles.EMPTY:
-            if iterations > max_iterations_with_given_radius:
-                radius += 1
-                iterations = 0
-
-            x = center.x + floor(radius * (random.randint(-100, 100) / 100))
-            y = center.y + floor(radius * (random.randint(-100, 100) / 100))
-            pos = Coords(x, y)
-            iterations += 1
-        return pos
-
-    def generate_resources(self, wood: int, iron: int, wheat: int):
-        self.generate_resource(wood, Tiles.WOOD)
-        self.generate_resource(iron, Tiles.IRON)
-        self.generate_resource(wheat, Tiles.WHEAT)
-
-    def generate_gold(self, gold: int):
-        for _ in range(gold):
-            pos = self.get_unpopulated_tile()
-            self.set_tile(pos, Tiles.GOLD)
-
-    def generate_energy_pots(self, energy_pots: int):
-        for _ in range(energy_pots):
-            pos = self.get_unpopulated_tile()
-            self.set_tile(pos, Tiles.ENERGY_POT)
-
-    def generate_resource(self, resource_percentage: int, resource: TileType):
-        total_resource_tiles = (resource_percentage * self.size) // 100
-        for _ in range(total_resource_tiles):
-            pos = self.get_unpopulated_tile()
-            self.set_tile(pos, resource)
-
-    def get_unpopulated_tile(self) -> Coords:
-        pos = Coords(0, 0)
-        while self.get_tile(pos) != Tiles.EMPTY:
-            x = random.randint(0, self.width - 1)
-            y = random.randint(0, self.height - 1)
-            pos = Coords(x, y)
-        return pos
-
-    def generate_village(self, village: Village, num_of_players: int):
-        center = village.center
-        for index in range(num_of_players):
-            angle = (2 * math.pi / num_of_players) * index
-            house_x = center.x + math.floor(math.cos(angle) * self.village_radius)
-            house_y = center.y + math.floor(math.sin(angle) * self.village_radius)
-            self.generate_house(house_x, house_y, village.tile)
-
-    def generate_house(self, x: int, y: int, tile: TileType):
-        x += self.get_variance()
-        y += self.get_variance()
-        for i in range(-1, 2):
-            for j in range(-1, 2):
-                pos = Coords(x + i, y + j)
-                self.set_tile(pos, tile)
+    def sample_free_cells(
+        self, center: Coords, radius: int, count: int, occupied: np.ndarray
+    ) -> np.ndarray:
+        """Returns `count` distinct empty, unoccupied cells as (x, y) rows,
+        drawn uniformly from the square of the given radius around `center`.
+        The square grows until it holds enough free cells."""
+        free = (self.matrix == Tiles.EMPTY.index) & ~occupied
+        if count > np.count_nonzero(free):
+            raise ValueError(f"There are not enough free cells for {count} agents.")
+
+        radius = max(radius, 1)
+        while True:
+            x0, y0 = max(center.x - radius, 0), max(center.y - radius, 0)
+            window = free[x0 : center.x + radius + 1, y0 : center.y + radius + 1]
+            cells = np.flatnonzero(window)
+            if len(cells) >= count:
+                break
+            radius *= 2
+
+        chosen = self.rng.choice(cells, count, replace=False)
+        xs, ys = np.divmod(chosen, window.shape[1])
+        return np.stack((xs + x0, ys + y0), axis=1)
+
+    def scatter_tiles(self, matrix: np.ndarray, counts: dict[int, int]):
+        """Places `counts[index]` tiles of every tile index on distinct empty
+        cells of `matrix`, all drawn in a single sample."""
+        empty = np.flatnonzero(matrix == Tiles.EMPTY.index)
+        total = sum(counts.values())
+        if total > len(empty):
+            raise ValueError(
+                f"{total} resources, golds and energy pots do not fit in the "
+                f"{len(empty)} empty cells of the map."
+            )
+
+        chosen = self.rng.choice(empty, total, replace=False)
+        matrix.flat[chosen] = np.repeat(list(counts), list(counts.values()))
+
+    def generate_village(self, matrix: np.ndarray, village: Village, houses: int):
+        # Houses are 3x3 squares spread on a circle around the center, each
+        # shifted by a small random amount. The parts of the houses that
+        # fall outside the map are dropped.
+        angles = (2 * math.pi / houses) * np.arange(houses)
+        shift = self.variance // 2
+        xs = village.center.x + np.floor(np.cos(angles) * self.village_radius)
+        ys = village.center.y + np.floor(np.sin(angles) * self.village_radius)
+        xs = xs.astype(int) + self.rng.integers(-shift, shift + 1, houses)
+        ys = ys.astype(int) + self.rng.integers(-shift, shift + 1, houses)
+
+        offsets = np.arange(-1, 2)
+        xs = (xs[:, None, None] + offsets[None, :, None]).repeat(3, axis=2).ravel()
+        ys = (ys[:, None, None] + offsets[None, None, :]).repeat(3, axis=1).ravel()
+        inside = (xs >= 0) & (xs < matrix.shape[0]) & (ys >= 0) & (ys < matrix.shape[1])
+        matrix[xs[inside], ys[inside]] = village.tile.index
 
     def print_map(self):
-        super().print("gamemap.txt")
+        super().print("gamemap.txt", self.occupancy.overlay(self.matrix))
@@ -0,0 +1,58 @@
+import numpy as np
+
+from .map import Map
+from .types import Coords
+
+MASK = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+
+def mix(value: int) -> int:
+    """splitmix64 finalizer of a single value."""
+    z = (value + GOLDEN_GAMMA) & MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+    return z ^ (z >> 31)
+
+
+def mix_array(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer of every value, same results as `mix`."""
+    with np.errstate(over="ignore"):
+        z = values.astype(np.uint64) + np.uint64(GOLDEN_GAMMA)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def hash_rows(rows: np.ndarray) -> int:
+    """Hash of a 2D integer array that depends on every value and on the
+    order of the rows."""
+    rows = np.asarray(rows).reshape(len(rows), -1)
+    hashes = mix_array(np.arange(len(rows)))
+    for column in rows.T:
+        hashes = mix_array(hashes ^ column.astype(np.uint64))
+    return int(np.bitwise_xor.reduce(hashes)) if len(hashes) else 0
+
+
+def hash_values(*values: int) -> int:
+    return hash_rows(np.array([values], dtype=np.uint64))
+
+
+class MapHash:
+    """Hash of the tiles of a map, kept up to date as they change. It is the
+    xor of one key per cell and tile index, so a change costs two mixes
+    instead of rehashing the matrix."""
+
+    def __init__(self, map: Map):
+        self.width = map.width
+        cells = np.arange(map.size, dtype=np.uint64)
+        codes = map.matrix.ravel().astype(np.uint64) & np.uint64(0xFF)
+        keys = mix_array((cells << np.uint64(8)) | codes)
+        self.value = int(np.bitwise_xor.reduce(keys))
+        map.add_observer(self._on_tile_changed)
+
+    def _key(self, pos: Coords, code: int) -> int:
+        return mix(((pos.x * self.width + pos.y) << 8) | (code & 0xFF))
+
+    def _on_tile_changed(self, pos: Coords, old: int, new: int):
+        self.value ^= self._key(pos, old) ^ self._key(pos, new)
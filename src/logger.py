@@ -1,8 +1,80 @@
+import atexit
+import json
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
 
 LOGGER = logging.getLogger("Default")
+LOGGER.propagate = False
 
-fh = logging.FileHandler("logging.log")
-LOGGER.setLevel(logging.DEBUG)
-fh.setLevel(logging.INFO)
-LOGGER.addHandler(fh)
+# Level above every logging level. Nothing is logged until `configure_logging`
+# is called, so library use, batches and benchmarks pay no logging cost.
+OFF = logging.CRITICAL + 1
+LOGGER.setLevel(OFF)
+
+_listener: Optional[QueueListener] = None
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Queue handler that hands records over unformatted. The standard one
+    formats them in the calling thread, this one leaves it to the writer.
+    Messages must only take immutable arguments for this to be safe."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class EventFormatter(logging.Formatter):
+    """Formats a record as one compact JSON object per line. The message
+    template names the event and its arguments are kept as a list, so the
+    log can be parsed without matching free text."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            "t": round(record.created, 6),
+            "level": record.levelname,
+            "event": record.msg,
+            "args": record.args or [],
+        }
+        return json.dumps(event, default=str, separators=(",", ":"))
+
+
+def configure_logging(
+    path: Optional[str] = "logging.log",
+    level: int = logging.INFO,
+    structured: bool = False,
+):
+    """Sends the records of LOGGER through a queue to a background thread
+    that writes them to `path`, as text lines or as JSON events if
+    `structured`. A `path` of None turns logging off. Calling it again
+    replaces the previous configuration."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    for handler in LOGGER.handlers[:]:
+        LOGGER.removeHandler(handler)
+
+    if path is None:
+        LOGGER.setLevel(OFF)
+        return
+
+    file_handler = logging.FileHandler(path)
+    if structured:
+        file_handler.setFormatter(EventFormatter())
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = QueueListener(records, file_handler)
+    _listener.start()
+    LOGGER.addHandler(DeferredQueueHandler(records))
+    LOGGER.setLevel(level)
+
+
+def _stop_listener():
+    # Flushes the records still in the queue when the program exits.
+    if _listener is not None:
+        _listener.stop()
+
+
+atexit.register(_stop_listener)
@@ -1,3 +1,6 @@
+from collections import defaultdict
+from typing import Callable, Container, Iterable, Iterator, Optional
+
 import numpy as np
 
 from .tiles import Tiles, TileType
@@ -5,33 +8,325 @@ from .types import Coords
 
 
 class Map:
-    def __init__(self, matrix: np.ndarray):
+    # Tile types that cover most of a map. They are not kept in the index,
+    # queries for them fall back to scanning the matrix.
+    unindexed = frozenset({Tiles.EMPTY.index, Tiles.UNKNOWN.index})
+    # Up to this many indexed candidates, `nearest` compares them directly
+    # instead of searching the matrix in growing windows.
+    nearest_scan_limit = 256
+
+    def __init__(self, matrix: np.ndarray, track_frontier: bool = False):
         self.matrix = matrix
         self.height, self.width = self.matrix.shape
         self.size = self.height * self.width
-        self.positions = [
-            Coords(x, y) for x in range(self.height) for y in range(self.width)
-        ]
+
+        # Positions of every tile type that is not in `unindexed`, built by
+        # the first query that needs it, so that maps that are never
+        # searched, e.g. the game map, do not pay for it. Once built it is
+        # kept up to date by `set_tile` and `set_tiles`.
+        self._index: Optional[defaultdict[int, set[Coords]]] = None
+
+        # Which cells are known, and the generation at which every cell last
+        # changed. The generation grows by one with every write, so a copy of
+        # the map made at generation g can be brought up to date with the
+        # cells where `cell_generations > g`.
+        self.known = self.matrix != Tiles.UNKNOWN.index
+        self.generation = 0
+        self.cell_generations = np.zeros(self.matrix.shape, dtype=np.uint32)
+
+        # Callbacks called with (position, old index, new index) for every
+        # cell that changes.
+        self.observers: list[Callable[[Coords, int, int], None]] = []
+
+        # The frontier is made of the known cells next to unknown cells, the
+        # places worth exploring from. It is only tracked for maps that
+        # start out unknown, e.g. the knowledge maps of agents.
+        self.track_frontier = track_frontier
+        self.frontier: set[Coords] = set()
+        self._frontier_mask = np.zeros(self.matrix.shape, dtype=bool)
+        if track_frontier:
+            self._refresh_frontier(0, self.height, 0, self.width)
+
+    def add_observer(self, observer: Callable[[Coords, int, int], None]):
+        self.observers.append(observer)
+
+    @property
+    def positions(self) -> Iterator[Coords]:
+        """All the positions of the map in row-major order, generated on
+        demand. Prefer the vectorized queries below over iterating them."""
+        return (Coords(x, y) for x in range(self.height) for y in range(self.width))
 
     def get_tile(self, pos: Coords) -> TileType:
+        return Tiles.get(self.get_code(pos))
+
+    def get_code(self, pos: Coords) -> int:
+        """Index of the tile type at `pos`, without looking the type up."""
         if not self.is_pos_valid(pos):
-            return Tiles.INVALID
+            return Tiles.INVALID.index
 
-        return Tiles.get(self.matrix[pos.x][pos.y])
+        return int(self.matrix[pos.x, pos.y])
 
     def set_tile(self, pos: Coords, tile: TileType):
-        self.matrix[pos.x][pos.y] = tile.index
+        old = int(self.matrix[pos.x, pos.y])
+        if old == tile.index:
+            return
+
+        self.matrix[pos.x, pos.y] = tile.index
+        self.generation += 1
+        self.cell_generations[pos.x, pos.y] = self.generation
+        self.known[pos.x, pos.y] = tile.index != Tiles.UNKNOWN.index
+        self._on_change(pos, old, tile.index)
+
+        unknown = Tiles.UNKNOWN.index
+        if self.track_frontier and (old == unknown) != (tile.index == unknown):
+            self._refresh_frontier(pos.x - 1, pos.x + 2, pos.y - 1, pos.y + 2)
+
+    def set_tiles(
+        self,
+        values: np.ndarray,
+        where: Optional[np.ndarray] = None,
+        origin: Coords = Coords(0, 0),
+    ):
+        """Copies `values`, a matrix of tile indices, into the map with its
+        first cell at `origin`. If `where` is given, only the cells where it
+        is true are copied. The index is updated for the cells that actually
+        change."""
+        height, width = values.shape
+        view = self.matrix[origin.x : origin.x + height, origin.y : origin.y + width]
+        changed = view != values
+        if where is not None:
+            changed &= where
+
+        xs, ys = np.nonzero(changed)
+        if len(xs) == 0:
+            return
+
+        old_codes = view[xs, ys]
+        new_codes = values[xs, ys]
+        view[xs, ys] = new_codes
+        xs += origin.x
+        ys += origin.y
+        self.generation += 1
+        self.cell_generations[xs, ys] = self.generation
+        self.known[xs, ys] = new_codes != Tiles.UNKNOWN.index
+        for x, y, old, new in zip(
+            xs.tolist(), ys.tolist(), old_codes.tolist(), new_codes.tolist()
+        ):
+            self._on_change(Coords(x, y), old, new)
+
+        if self.track_frontier:
+            unknown = Tiles.UNKNOWN.index
+            flipped = (old_codes == unknown) != (new_codes == unknown)
+            if flipped.any():
+                fx, fy = xs[flipped], ys[flipped]
+                self._refresh_frontier(
+                    int(fx.min()) - 1,
+                    int(fx.max()) + 2,
+                    int(fy.min()) - 1,
+                    int(fy.max()) + 2,
+                )
+
+    def changed_since(self, generation: int) -> np.ndarray:
+        return self.cell_generations > generation
+
+    @property
+    def index(self) -> defaultdict[int, set[Coords]]:
+        if self._index is None:
+            self._index = defaultdict(set)
+            for code in np.unique(self.matrix).tolist():
+                if code in self.unindexed:
+                    continue
+
+                xs, ys = np.nonzero(self.matrix == code)
+                self._index[code] = set(map(Coords, xs.tolist(), ys.tolist()))
+        return self._index
+
+    def _on_change(self, pos: Coords, old: int, new: int):
+        # Called after the matrix already holds the new index.
+        if self._index is not None:
+            if old not in self.unindexed:
+                self._index[old].discard(pos)
+            if new not in self.unindexed:
+                self._index[new].add(pos)
+        for observer in self.observers:
+            observer(pos, old, new)
+
+    def _refresh_frontier(self, x0: int, x1: int, y0: int, y1: int):
+        """Recomputes the frontier inside the rows [x0, x1) and columns
+        [y0, y1), clipped to the map."""
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.height), min(y1, self.width)
+        # One more cell around the region is needed to tell whether the
+        # cells on its border have unknown neighbors.
+        cx0, cy0 = max(x0 - 1, 0), max(y0 - 1, 0)
+        unknown = self.matrix[cx0 : x1 + 1, cy0 : y1 + 1] == Tiles.UNKNOWN.index
+        frontier = dilate(unknown) & ~unknown
+        frontier = frontier[x0 - cx0 : x1 - cx0, y0 - cy0 : y1 - cy0]
+
+        region = self._frontier_mask[x0:x1, y0:y1]
+        xs, ys = np.nonzero(region != frontier)
+        for x, y, is_frontier in zip(
+            (xs + x0).tolist(), (ys + y0).tolist(), frontier[xs, ys].tolist()
+        ):
+            if is_frontier:
+                self.frontier.add(Coords(x, y))
+            else:
+                self.frontier.discard(Coords(x, y))
+        region[...] = frontier
+
+    def count_unknown_around(self, pos: Coords, radius: int) -> int:
+        window = self.matrix[
+            max(pos.x - radius, 0) : pos.x + radius + 1,
+            max(pos.y - radius, 0) : pos.y + radius + 1,
+        ]
+        return int(np.count_nonzero(window == Tiles.UNKNOWN.index))
+
+    def positions_of(self, tile: TileType) -> set[Coords]:
+        """Returns the indexed positions of a tile type. The returned set is
+        owned by the map and must not be modified."""
+        return self.index.get(tile.index, set())
+
+    def nearest(
+        self,
+        tiles: Iterable[TileType | int],
+        origin: Coords,
+        exclude: Container[Coords] = (),
+    ) -> Optional[Coords]:
+        """Returns the position of the closest cell of any of the given tile
+        types, or tile indices, that is not in `exclude`, or None. Distance
+        is the number of single-cell moves (Chebyshev distance) with ties
+        broken by Manhattan distance, then by position."""
+        codes = [int(tile) for tile in tiles]
+        if not codes:
+            return None
+
+        if not self.unindexed.intersection(codes):
+            candidates = sum(len(self.index.get(code, ())) for code in codes)
+            if candidates == 0:
+                return None
+            if candidates <= self.nearest_scan_limit:
+                return self._nearest_in_index(codes, origin, exclude)
+
+        return self._nearest_in_windows(codes, origin, exclude)
+
+    def _nearest_in_index(
+        self, codes: list[int], origin: Coords, exclude: Container[Coords]
+    ) -> Optional[Coords]:
+        best = None
+        best_key = None
+        for code in codes:
+            for pos in self.index.get(code, ()):
+                if pos in exclude:
+                    continue
+
+                dx = abs(pos.x - origin.x)
+                dy = abs(pos.y - origin.y)
+                key = (max(dx, dy), dx + dy, pos.x, pos.y)
+                if best_key is None or key < best_key:
+                    best, best_key = pos, key
+        return best
+
+    def _nearest_in_windows(
+        self, codes: list[int], origin: Coords, exclude: Container[Coords]
+    ) -> Optional[Coords]:
+        # Searches square windows of doubling radius around the origin. A
+        # match at Chebyshev distance <= radius is the global nearest, since
+        # every cell outside the window is farther than the radius.
+        radius = 8
+        while True:
+            x0 = max(origin.x - radius, 0)
+            y0 = max(origin.y - radius, 0)
+            window = self.matrix[x0 : origin.x + radius + 1, y0 : origin.y + radius + 1]
+            xs, ys = np.nonzero(np.isin(window, codes))
+            xs += x0
+            ys += y0
+            dx = np.abs(xs - origin.x)
+            dy = np.abs(ys - origin.y)
+            chebyshev = np.maximum(dx, dy)
+
+            for i in np.lexsort((ys, xs, dx + dy, chebyshev)).tolist():
+                if chebyshev[i] > radius:
+                    break
+
+                pos = Coords(int(xs[i]), int(ys[i]))
+                if pos not in exclude:
+                    return pos
+
+            covers_map = window.shape == self.matrix.shape
+            if covers_map:
+                return None
+            radius *= 2
+
+    def find(self, tile: TileType) -> np.ndarray:
+        """Returns an (N, 2) array with the positions of all the cells of the
+        given tile type, in row-major order."""
+        return np.argwhere(self.matrix == tile.index)
 
-    def print(self, filename: str):
-        with open(filename, "w") as f:
-            for i in range(self.width):
-                for j in range(self.height):
-                    symbol = Tiles.get(self.matrix[j][i]).symbol
-                    f.write(symbol)
+    def find_first(self, tile: TileType) -> Optional[Coords]:
+        matches = self.matrix == tile.index
+        first = int(matches.argmax())
+        if not matches.flat[first]:
+            return None
 
-                f.write("\n")
+        x, y = divmod(first, self.width)
+        return Coords(x, y)
+
+    def count(self, tile: TileType) -> int:
+        return int(np.count_nonzero(self.matrix == tile.index))
+
+    def counts(self) -> np.ndarray:
+        """Returns the number of cells of every tile type, indexed by the tile
+        type index."""
+        return np.bincount(self.matrix.ravel(), minlength=len(Tiles.registry))
+
+    def mask(self, tiles: Iterable[TileType]) -> np.ndarray:
+        return np.isin(self.matrix, [tile.index for tile in tiles])
+
+    def print(self, filename: str, matrix: Optional[np.ndarray] = None):
+        """Writes the map, or `matrix` in its place, as text. The file is
+        written column by column, one line per column."""
+        write_text(filename, self.matrix if matrix is None else matrix)
 
     def is_pos_valid(self, coords: Coords) -> bool:
         x = coords.x
         y = coords.y
         return 0 <= x <= self.matrix.shape[0] and 0 <= y <= self.matrix.shape[1]
+
+
+def write_text(filename: str, matrix: np.ndarray):
+    """Writes a matrix of tile indices as text, one line per column."""
+    symbols = Tiles.to_symbols(matrix.T)
+    with open(filename, "w") as f:
+        f.writelines("".join(line) + "\n" for line in symbols)
+
+
+def read_text(filename: str) -> np.ndarray:
+    """Reads a matrix of tile indices written by `write_text`."""
+    with open(filename, "r") as f:
+        lines = [line.rstrip("\n") for line in f if line.strip()]
+    if not lines or len({len(line) for line in lines}) != 1:
+        raise ValueError(f"The lines of {filename} are not all the same length.")
+
+    # The index of a tile type is its position in `Tiles.symbols`.
+    symbols = np.array([list(line) for line in lines]).T
+    order = np.argsort(Tiles.symbols)
+    found = np.searchsorted(Tiles.symbols, symbols, sorter=order)
+    matrix = order[np.minimum(found, len(order) - 1)]
+    unknown = Tiles.symbols[matrix] != symbols
+    if unknown.any():
+        raise ValueError(
+            f"Unknown tile symbols in {filename}: {sorted(set(symbols[unknown]))}"
+        )
+    return matrix
+
+
+def dilate(mask: np.ndarray) -> np.ndarray:
+    """Grows a boolean mask by one cell in all eight directions. The mask
+    can be a stack of masks, the last two axes are the map's."""
+    rows = mask.copy()
+    rows[..., 1:, :] |= mask[..., :-1, :]
+    rows[..., :-1, :] |= mask[..., 1:, :]
+    grown = rows.copy()
+    grown[..., :, 1:] |= rows[..., :, :-1]
+    grown[..., :, :-1] |= rows[..., :, 1:]
+    return grown
@@ -0,0 +1,81 @@
+"""On-disk cache of generated maps. A map is stored under a hash of the
+parameters and the seed it was generated from, along with the state of the
+map's random generator after generating it, which goes on to place the
+agents. A game that finds its map in the cache plays exactly like one that
+generated it.
+
+The cache is off until `configure_map_cache` is given a directory.
+"""
+
+import hashlib
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+from .config import GameConfig
+from .game_map import GameMap
+
+# Part of every key. Bump it when a change to the generation gives other
+# maps for the same parameters, so that the old maps are not used.
+GENERATOR_VERSION = 1
+
+_directory: Optional[str] = None
+
+
+def configure_map_cache(directory: Optional[str]):
+    """Stores and looks up generated maps in `directory`, or nowhere if it
+    is None. The directory can be shared by concurrent processes."""
+    global _directory
+    _directory = directory
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+
+
+def is_enabled() -> bool:
+    return _directory is not None
+
+
+def cache_key(config: GameConfig, seed: np.random.SeedSequence) -> str:
+    parameters = {
+        "version": GENERATOR_VERSION,
+        "variance": GameMap.variance,
+        "width": config.width,
+        "height": config.height,
+        "resources": {k: config.resources[k] for k in ("wood", "iron", "wheat")},
+        "golds": config.golds,
+        "energy_pots": config.energy_pots,
+        "agents": [team.agents for team in config.teams],
+        "entropy": str(seed.entropy),
+        "spawn_key": list(seed.spawn_key),
+    }
+    text = json.dumps(parameters, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _path(key: str) -> str:
+    assert _directory is not None, "the map cache is not configured"
+    return os.path.join(_directory, f"{key}.npz")
+
+
+def load_map(key: str) -> Optional[tuple[np.ndarray, dict]]:
+    """Returns the matrix and generator state stored under `key`, or None if
+    there are none."""
+    try:
+        with np.load(_path(key)) as cached:
+            return cached["matrix"], json.loads(str(cached["rng_state"]))
+    except FileNotFoundError:
+        return None
+
+
+def store_map(key: str, matrix: np.ndarray, rng_state: dict):
+    path = _path(key)
+    # Written aside and renamed, so that other processes never read a map
+    # that is half written.
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        np.savez(
+            f, matrix=matrix.astype(np.int8), rng_state=np.array(json.dumps(rng_state))
+        )
+    os.replace(temporary, path)
@@ -15,33 +15,39 @@ class Menu:
         self.label_width = 200
         self.text_objects: list[arcade.Text] = []
 
-        self.team1_resourses_text = arcade.Text(
+        self.round_text = arcade.Text(
             text="",
             x=int(self.point[0] - 0.47 * MENU_WIDTH),
             y=int(self.point[1]),
             color=self.color,
             font_size=self.label_font_size,
             width=self.label_width,
-            anchor_x="left",
+            anchor_y="center",
         )
+        self.team_texts: list[arcade.Text] = []
 
-        self.round_text = arcade.Text(
-            text="",
-            x=int(self.point[0] - 0.05 * MENU_WIDTH),
-            y=int(self.point[1]),
-            color=self.color,
-            font_size=self.label_font_size,
-            width=self.label_width,
-        )
+    def _layout_teams(self, teams: int):
+        # The resources of the teams go in two columns right of the round,
+        # with smaller text the more rows there are.
+        columns = 1 if teams == 1 else 2
+        rows = -(-teams // columns)
+        font_size = min(self.label_font_size, int(self.height / (rows * 1.6)))
+        left = self.point[0] - 0.3 * MENU_WIDTH
+        column_width = 0.75 * MENU_WIDTH / columns
+        top = self.point[1] + self.height / 2
 
-        self.team2_resourses_text = arcade.Text(
-            text="",
-            x=int(self.point[0] + 0.1 * MENU_WIDTH),
-            y=int(self.point[1]),
-            color=self.color,
-            font_size=self.label_font_size,
-            width=self.label_width,
-        )
+        self.team_texts = [
+            arcade.Text(
+                text="",
+                x=int(left + (index % columns) * column_width),
+                y=int(top - (index // columns + 0.5) * self.height / rows),
+                color=self.color,
+                font_size=font_size,
+                anchor_x="left",
+                anchor_y="center",
+            )
+            for index in range(teams)
+        ]
 
     @property
     def shape(self) -> Shape:
@@ -49,10 +55,14 @@ class Menu:
             *self.point, self.width, self.height, self.color, 1
         )
 
-    def render(self, team1_resourses: str, team2_resourses: str, round: int):
-        self.team1_resourses_text.text = team1_resourses
-        self.round_text.text = f"Round {round}"
-        self.team2_resourses_text.text = team2_resourses
-        self.team1_resourses_text.draw()
+    def render(self, team_resources: list[str], round: int, speed: str = ""):
+        if len(self.team_texts) != len(team_resources):
+            self._layout_teams(len(team_resources))
+
+        self.round_text.text = f"Round {round} {speed}".rstrip()
         self.round_text.draw()
-        self.team2_resourses_text.draw()
+        for index, (text, resources) in enumerate(
+            zip(self.team_texts, team_resources), start=1
+        ):
+            text.text = f"Team {index}: {resources}"
+            text.draw()
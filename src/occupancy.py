@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from .types import Coords
+
+if TYPE_CHECKING:
+    from .agent import Agent
+
+
+class Occupancy:
+    """Layer of the game map that holds which agent stands on every cell,
+    kept apart from the terrain so that agents never hide the tile they
+    stand on."""
+
+    FREE = -1
+
+    def __init__(self, height: int, width: int):
+        self.height = height
+        self.width = width
+        # Index into `agents` of the agent standing on every cell.
+        self.grid = np.full((height, width), self.FREE, dtype=np.int32)
+        self.agents: list[Agent] = []
+        self._tile_indices = np.empty(0, dtype=np.int64)
+
+    def place(self, agent: Agent, pos: Coords):
+        if self.is_occupied(pos):
+            raise ValueError(f"Cell {pos} is already occupied.")
+
+        self.grid[pos.x, pos.y] = len(self.agents)
+        self.agents.append(agent)
+        self._tile_indices = np.append(self._tile_indices, agent.tile_type.index)
+
+    def move(self, old: Coords, new: Coords):
+        if old == new:
+            return
+        if self.is_occupied(new):
+            raise ValueError(f"Cell {new} is already occupied.")
+
+        self.grid[new.x, new.y] = self.grid[old.x, old.y]
+        self.grid[old.x, old.y] = self.FREE
+
+    def is_occupied(self, pos: Coords) -> bool:
+        return self.grid[pos.x, pos.y] != self.FREE
+
+    def agent_at(self, pos: Coords) -> Optional[Agent]:
+        slot = int(self.grid[pos.x, pos.y])
+        return None if slot == self.FREE else self.agents[slot]
+
+    def neighbors(self, pos: Coords, radius: int = 1) -> list[Agent]:
+        """Agents within `radius` cells of `pos` in each axis, excluding the
+        one standing on `pos`, in row-major order."""
+        x0 = max(pos.x - radius, 0)
+        y0 = max(pos.y - radius, 0)
+        window = self.grid[x0 : pos.x + radius + 1, y0 : pos.y + radius + 1]
+        xs, ys = np.nonzero(window != self.FREE)
+        return [
+            self.agents[int(window[x, y])]
+            for x, y in zip(xs.tolist(), ys.tolist())
+            if (x0 + x, y0 + y) != (pos.x, pos.y)
+        ]
+
+    def overlay(self, matrix: np.ndarray) -> np.ndarray:
+        """Returns a copy of the terrain `matrix` with the agent tiles drawn
+        on the occupied cells."""
+        shown = matrix.copy()
+        occupied = self.grid != self.FREE
+        shown[occupied] = self._tile_indices[self.grid[occupied]]
+        return shown
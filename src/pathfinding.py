@@ -0,0 +1,346 @@
+import heapq
+from collections import deque
+from dataclasses import dataclass
+from itertools import count
+from typing import Callable, Optional
+
+import numpy as np
+
+from . import profiling
+from .logger import LOGGER
+from .map import Map, dilate
+from .types import Coords
+
+# Tile indices agents cannot walk on. No terrain blocks movement at the
+# moment, other agents are avoided through the `is_blocked` callbacks.
+IMPASSABLE: frozenset[int] = frozenset()
+
+
+def is_passable(map: Map, pos: Coords) -> bool:
+    return int(map.matrix[pos.x, pos.y]) not in IMPASSABLE
+
+
+def neighbors(map: Map, pos: Coords, move_range: int) -> list[Coords]:
+    """Cells reachable from `pos` in a single move of up to `move_range`
+    cells in each axis."""
+    return [
+        Coords(x, y)
+        for x in range(
+            max(pos.x - move_range, 0), min(pos.x + move_range + 1, map.height)
+        )
+        for y in range(
+            max(pos.y - move_range, 0), min(pos.y + move_range + 1, map.width)
+        )
+        if x != pos.x or y != pos.y
+    ]
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    # Cells to move through, excluding the start and including the goal.
+    # None if the goal cannot be reached.
+    path: Optional[list[Coords]]
+    expanded: int
+
+
+def find_path(
+    map: Map,
+    start: Coords,
+    goal: Coords,
+    move_range: int = 1,
+    is_blocked: Callable[[Coords], bool] = lambda pos: False,
+) -> SearchResult:
+    """A* search from `start` to `goal` where every move costs one and can
+    go up to `move_range` cells in each axis. The goal is never considered
+    blocked, an agent standing on it does not make it unreachable."""
+    if start == goal:
+        return SearchResult([], 0)
+
+    def heuristic(pos: Coords) -> int:
+        distance = max(abs(pos.x - goal.x), abs(pos.y - goal.y))
+        return -(-distance // move_range)
+
+    # Entries are (f, h, tie breaker, position). Preferring the lower h on
+    # equal f follows one of the many equally short paths of an open grid
+    # instead of expanding all of them.
+    tie_breaker = count()
+    open_heap = [(heuristic(start), heuristic(start), next(tie_breaker), start)]
+    came_from: dict[Coords, Coords] = {}
+    cost = {start: 0}
+    closed: set[Coords] = set()
+    expanded = 0
+
+    while open_heap:
+        _, _, _, current = heapq.heappop(open_heap)
+        if current in closed:
+            continue
+
+        if current == goal:
+            path = [current]
+            while path[-1] in came_from and came_from[path[-1]] != start:
+                path.append(came_from[path[-1]])
+            path.reverse()
+            return SearchResult(path, expanded)
+
+        closed.add(current)
+        expanded += 1
+        next_cost = cost[current] + 1
+
+        for neighbor in neighbors(map, current, move_range):
+            if neighbor in closed or next_cost >= cost.get(neighbor, next_cost + 1):
+                continue
+
+            if neighbor != goal and (
+                not is_passable(map, neighbor) or is_blocked(neighbor)
+            ):
+                continue
+
+            cost[neighbor] = next_cost
+            came_from[neighbor] = current
+            h = heuristic(neighbor)
+            heapq.heappush(open_heap, (next_cost + h, h, next(tie_breaker), neighbor))
+
+    return SearchResult(None, expanded)
+
+
+class PathPlanner:
+    """Keeps the path of one agent between ticks. The path is only searched
+    again when the goal changes, when a cell on the remaining path becomes
+    impassable on the map or when the next step is blocked."""
+
+    # Ticks to wait for an agent standing on the goal before stepping aside.
+    patience = 2
+
+    def __init__(self, map: Map, move_range: int):
+        self.map = map
+        self.move_range = move_range
+        self.goal: Optional[Coords] = None
+        self.path: deque[Coords] = deque()
+        self.is_stale = True
+        # Ticks spent waiting for an agent to leave the goal.
+        self.waited = 0
+
+        # Search statistics, logged at debug level after every search to
+        # tell how much work planning costs.
+        self.searches = 0
+        self.expanded = 0
+
+        map.add_observer(self._on_tile_changed)
+
+    def _on_tile_changed(self, pos: Coords, old: int, new: int):
+        if self.is_stale or (old in IMPASSABLE) == (new in IMPASSABLE):
+            return
+
+        if pos in self.path:
+            self.is_stale = True
+
+    def next_step(
+        self,
+        start: Coords,
+        goal: Coords,
+        is_blocked: Callable[[Coords], bool] = lambda pos: False,
+    ) -> Optional[Coords]:
+        """Returns the next cell to move to on the way from `start` to
+        `goal`, or None if there is no move to make this tick."""
+        if goal != self.goal or self.is_stale or not self.path:
+            self._plan(start, goal, is_blocked)
+        elif self.path[0] != goal and is_blocked(self.path[0]):
+            self._plan(start, goal, is_blocked)
+
+        if not self.path:
+            return None
+
+        if is_blocked(self.path[0]):
+            # Only the goal can be blocked here. Two agents that want each
+            # other's cell would wait forever, so after a while step aside
+            # and plan again from there.
+            self.waited += 1
+            if self.waited <= self.patience:
+                return None
+
+            self.is_stale = True
+            return self._sidestep(start, goal, is_blocked)
+
+        return self.path[0]
+
+    def advance(self):
+        self.waited = 0
+        if self.is_stale:
+            return
+
+        self.path.popleft()
+
+    def _sidestep(
+        self, start: Coords, goal: Coords, is_blocked: Callable[[Coords], bool]
+    ) -> Optional[Coords]:
+        free = [
+            pos
+            for pos in neighbors(self.map, start, self.move_range)
+            if pos != goal and is_passable(self.map, pos) and not is_blocked(pos)
+        ]
+        if not free:
+            return None
+
+        return min(free, key=lambda pos: max(abs(pos.x - goal.x), abs(pos.y - goal.y)))
+
+    def _plan(self, start: Coords, goal: Coords, is_blocked: Callable[[Coords], bool]):
+        result = find_path(self.map, start, goal, self.move_range, is_blocked)
+        self.searches += 1
+        self.expanded += result.expanded
+        LOGGER.debug(
+            "path from %s to %s: %s steps, %s expanded, %s searches, %s expanded in all",
+            start,
+            goal,
+            None if result.path is None else len(result.path),
+            result.expanded,
+            self.searches,
+            self.expanded,
+        )
+
+        self.goal = goal
+        self.path = deque(result.path or ())
+        self.is_stale = False
+
+
+class DistanceField:
+    """Number of single-cell moves from every cell to the closest source
+    cell, e.g. to the tiles of a village. It is computed once and then kept
+    up to date as cells of the map change passability, so everyone heading
+    to the sources can share it and pick their next step by looking at
+    their neighborhood only."""
+
+    UNREACHABLE = np.iinfo(np.int32).max
+
+    def __init__(self, map: Map, sources: np.ndarray):
+        self.map = map
+        self.sources = sources.copy()
+        self.distances = self._compute()
+        map.add_observer(self._on_tile_changed)
+
+    def distance(self, pos: Coords) -> int:
+        return int(self.distances[pos.x, pos.y])
+
+    def next_step(
+        self,
+        pos: Coords,
+        move_range: int = 1,
+        is_blocked: Callable[[Coords], bool] = lambda pos: False,
+    ) -> Optional[Coords]:
+        """Returns the free cell within `move_range` of `pos` that is closest
+        to the sources, or None if no such cell is closer than `pos`."""
+        x0 = max(pos.x - move_range, 0)
+        y0 = max(pos.y - move_range, 0)
+        window = self.distances[
+            x0 : pos.x + move_range + 1, y0 : pos.y + move_range + 1
+        ]
+        current = self.distance(pos)
+
+        for flat in np.argsort(window, axis=None, kind="stable").tolist():
+            x, y = divmod(flat, window.shape[1])
+            if window[x, y] >= current:
+                break
+
+            step = Coords(x0 + x, y0 + y)
+            if not is_blocked(step):
+                return step
+        return None
+
+    def _passable(self) -> np.ndarray:
+        impassable = np.isin(self.map.matrix, list(IMPASSABLE))
+        return ~impassable | self.sources
+
+    def _compute(self) -> np.ndarray:
+        # Breadth-first wavefront over the whole matrix. Each iteration grows
+        # the reached area by one cell in every direction.
+        passable = self._passable()
+        distances = np.full(self.sources.shape, self.UNREACHABLE, dtype=np.int32)
+        frontier = self.sources & passable
+        reached = frontier.copy()
+        distances[frontier] = 0
+
+        distance = 0
+        while frontier.any():
+            distance += 1
+            frontier = dilate(frontier) & passable & ~reached
+            distances[frontier] = distance
+            reached |= frontier
+
+        return distances
+
+    def _on_tile_changed(self, pos: Coords, old: int, new: int):
+        was_passable = old not in IMPASSABLE or self.sources[pos.x, pos.y]
+        is_passable = new not in IMPASSABLE or self.sources[pos.x, pos.y]
+        if was_passable and not is_passable:
+            self._block(pos)
+        elif is_passable and not was_passable:
+            self._unblock(pos)
+
+    def _unblock(self, pos: Coords):
+        # Distances can only decrease, relax outwards from the opened cell.
+        best = min(
+            (self.distance(n) for n in neighbors(self.map, pos, 1)),
+            default=self.UNREACHABLE,
+        )
+        if best == self.UNREACHABLE:
+            return
+
+        self.distances[pos.x, pos.y] = best + 1
+        self._relax([(best + 1, pos.x, pos.y)])
+
+    def _block(self, pos: Coords):
+        # Every cell whose distance was derived through the blocked cell may
+        # get farther. Forget their distances and recompute them from the
+        # untouched cells around them.
+        affected = {pos}
+        queue = deque([pos])
+        while queue:
+            current = queue.popleft()
+            next_distance = self.distance(current) + 1
+            for neighbor in neighbors(self.map, current, 1):
+                if (
+                    neighbor not in affected
+                    and self.distance(neighbor) == next_distance
+                ):
+                    affected.add(neighbor)
+                    queue.append(neighbor)
+
+        for cell in affected:
+            self.distances[cell.x, cell.y] = self.UNREACHABLE
+
+        seeds = []
+        passable = self._passable()
+        for cell in affected:
+            if not passable[cell.x, cell.y]:
+                continue
+
+            best = min(
+                (self.distance(n) for n in neighbors(self.map, cell, 1)),
+                default=self.UNREACHABLE,
+            )
+            if best != self.UNREACHABLE:
+                self.distances[cell.x, cell.y] = best + 1
+                seeds.append((best + 1, cell.x, cell.y))
+
+        self._relax(seeds)
+
+    def _relax(self, seeds: list[tuple[int, int, int]]):
+        # Dijkstra from the seeds, entries are (distance, x, y).
+        heap = list(seeds)
+        heapq.heapify(heap)
+        while heap:
+            distance, x, y = heapq.heappop(heap)
+            current = Coords(x, y)
+            if distance > self.distance(current):
+                continue
+
+            for neighbor in neighbors(self.map, current, 1):
+                if distance + 1 >= self.distance(neighbor):
+                    continue
+                if not is_passable(self.map, neighbor):
+                    continue
+
+                self.distances[neighbor.x, neighbor.y] = distance + 1
+                heapq.heappush(heap, (distance + 1, neighbor.x, neighbor.y))
+
+
+profiling.hook(PathPlanner, "_plan", "path.plan")
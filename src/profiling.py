@@ -0,0 +1,168 @@
+"""Timers and call counts of the hot paths, switched on per run. Modules
+declare the functions worth timing with `hook`, and `enable` wraps them in
+timers that fill one histogram per phase. Until then the functions are left
+as they are, so a run without profiling calls exactly the same code.
+
+The timings are inclusive, a phase called from another one counts in both.
+"""
+
+import functools
+from dataclasses import dataclass, field
+from time import perf_counter_ns
+from typing import Any, Callable, Optional
+
+# Durations up to 2**63 ns fall in one of these buckets.
+BUCKETS = 64
+
+
+@dataclass
+class Histogram:
+    """Durations in nanoseconds, counted in powers of two buckets. Bucket i
+    holds the durations of i bits, that is below 2**i ns."""
+
+    buckets: list[int] = field(default_factory=lambda: [0] * BUCKETS)
+    calls: int = 0
+    total: int = 0
+    max: int = 0
+
+    def add(self, duration: int):
+        self.buckets[duration.bit_length()] += 1
+        self.calls += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+    def percentile(self, p: float) -> int:
+        """Upper bound of the bucket of the `p` percentile, in nanoseconds."""
+        rank = p / 100 * self.calls
+        seen = 0
+        for bits, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(1 << bits, self.max)
+        return self.max
+
+
+class Profiler:
+    def __init__(self):
+        self.histograms: dict[str, Histogram] = {}
+
+    def record(self, name: str, duration: int):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.add(duration)
+
+    def totals(self) -> dict[str, float]:
+        """Seconds spent in every phase."""
+        return {name: h.total / 1e9 for name, h in sorted(self.histograms.items())}
+
+    def reset(self):
+        self.histograms.clear()
+
+    def report(self) -> str:
+        lines = [
+            f"{'phase':<40} {'calls':>9} {'total ms':>10} {'mean us':>9} "
+            f"{'p50 us':>8} {'p99 us':>8} {'max us':>9}"
+        ]
+        for name, h in sorted(
+            self.histograms.items(), key=lambda item: item[1].total, reverse=True
+        ):
+            lines.append(
+                f"{name:<40} {h.calls:>9} {h.total / 1e6:>10.1f} "
+                f"{h.total / h.calls / 1e3:>9.1f} {h.percentile(50) / 1e3:>8.1f} "
+                f"{h.percentile(99) / 1e3:>8.1f} {h.max / 1e3:>9.1f}"
+            )
+        return "\n".join(lines)
+
+
+PROFILER = Profiler()
+
+
+@dataclass(frozen=True)
+class Hook:
+    owner: type
+    attribute: str
+    name: str
+    # Labels a call by its first argument, every label gets a histogram.
+    label: Optional[Callable[[Any], Any]] = None
+
+
+_hooks: list[Hook] = []
+# Attributes replaced by timers, to be put back by `disable`.
+_originals: dict[Hook, Any] = {}
+
+
+def hook(
+    owner: type,
+    attribute: str,
+    name: str,
+    label: Optional[Callable[[Any], Any]] = None,
+):
+    """Declares that the method or property setter `attribute` of `owner`
+    is timed as `name` while profiling is enabled."""
+    new_hook = Hook(owner, attribute, name, label)
+    _hooks.append(new_hook)
+    if is_enabled():
+        _install(new_hook)
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+def enable():
+    """Times every hooked function, including the ones of modules imported
+    later on."""
+    for h in _hooks:
+        if h not in _originals:
+            _install(h)
+
+
+def disable():
+    for h, original in _originals.items():
+        setattr(h.owner, h.attribute, original)
+    _originals.clear()
+
+
+def _timed(function: Callable, name: str, label: Optional[Callable]) -> Callable:
+    record = PROFILER.record
+
+    if label is None:
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, perf_counter_ns() - start)
+
+    else:
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            # Labeled on entry, before the call can change what it depends on.
+            labeled = f"{name}[{label(args[0])}]"
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(labeled, perf_counter_ns() - start)
+
+    return timed
+
+
+def _install(h: Hook):
+    original = h.owner.__dict__[h.attribute]
+    if isinstance(original, property):
+        timed = property(
+            original.fget,
+            _timed(original.fset, h.name, h.label),
+            original.fdel,
+            original.__doc__,
+        )
+    else:
+        timed = _timed(original, h.name, h.label)
+    _originals[h] = original
+    setattr(h.owner, h.attribute, timed)
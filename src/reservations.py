@@ -0,0 +1,67 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from .types import Coords
+
+
+@dataclass(frozen=True)
+class Reservation:
+    agent_id: int
+    expires_at: int
+
+
+class Reservations:
+    """Cells claimed by the agents of a team, so that two agents do not go
+    after the same resource. Every agent holds at most one reservation,
+    which ends when the agent releases it, reserves another cell, or after
+    `ttl` rounds in case the agent never comes back to it."""
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.round = 0
+        self._by_position: dict[Coords, Reservation] = {}
+        self._by_agent: dict[int, Coords] = {}
+
+    def __contains__(self, pos: object) -> bool:
+        reservation = self._by_position.get(pos)  # type: ignore[arg-type]
+        if reservation is None:
+            return False
+
+        if reservation.expires_at <= self.round:
+            self.release(reservation.agent_id)
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self._by_position)
+
+    def holder(self, pos: Coords) -> Optional[int]:
+        """Returns the id of the agent holding the reservation of `pos`."""
+        if pos not in self:
+            return None
+        return self._by_position[pos].agent_id
+
+    def reserve(self, pos: Coords, agent_id: int):
+        self.release(agent_id)
+        self._by_position[pos] = Reservation(agent_id, self.round + self.ttl)
+        self._by_agent[agent_id] = pos
+
+    def release(self, agent_id: int):
+        pos = self._by_agent.pop(agent_id, None)
+        if pos is not None:
+            del self._by_position[pos]
+
+    def advance(self):
+        """Moves to the next round. Expired reservations are dropped lazily
+        on lookup and, so they cannot pile up, once every `ttl` rounds."""
+        self.round += 1
+        if self.round % self.ttl != 0:
+            return
+
+        expired = [
+            reservation.agent_id
+            for reservation in self._by_position.values()
+            if reservation.expires_at <= self.round
+        ]
+        for agent_id in expired:
+            self.release(agent_id)
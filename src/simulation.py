@@ -0,0 +1,235 @@
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from . import map_cache, profiling
+from .agent import STATE_CODES, ResourcePile, Team, Village
+from .config import GameConfig
+from .game_map import GameMap
+from .hashing import MapHash, hash_rows, hash_values
+from .logger import LOGGER
+from .tiles import Tiles
+from .types import Coords
+
+DEFAULT_MAX_ROUNDS = 10_000
+# Distance of the village centers from the middle of the map, relative to
+# its size.
+VILLAGE_ORBIT = 0.2 * math.sqrt(2)
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    # Index of the winning team in `Simulation.teams`, None if the round
+    # limit was reached before any team collected its resources.
+    winner: Optional[int]
+    rounds: int
+    resources: list[dict[str, int]]
+
+
+def village_center(config: GameConfig, team: int) -> Coords:
+    """Center of the village of the team with index `team`. The villages
+    are spread evenly on a circle around the middle of the map, starting
+    from the top left so that two teams sit at 3/10 and 7/10 of it."""
+    angle = math.radians(225) + 2 * math.pi * team / len(config.teams)
+    # Rounding first keeps the exact tenths from turning into the cell
+    # before them.
+    # The matrix is (height, width), so x runs along the height.
+    x = config.height * (0.5 + VILLAGE_ORBIT * math.cos(angle))
+    y = config.width * (0.5 + VILLAGE_ORBIT * math.sin(angle))
+    center = Coords(math.floor(round(x, 6)), math.floor(round(y, 6)))
+    assert 0 <= center.x < config.height and 0 <= center.y < config.width
+    return center
+
+
+def create_teams(
+    config: GameConfig, centers: Optional[list[Coords]] = None
+) -> list[Team]:
+    """Creates the teams of the config, with their villages at `centers` or
+    at the default places if it is not given."""
+    teams = []
+    for index, team_config in enumerate(config.teams):
+        village_tile, agent_tile = Tiles.team_tiles(index)
+        center = village_center(config, index) if centers is None else centers[index]
+        LOGGER.info("Center of village %s: %s", index + 1, center)
+
+        teams.append(
+            Team(
+                Village(center, village_tile),
+                ResourcePile(**team_config.resources),
+                agent_tile,
+                config,
+                team_config.move_range,
+                team_config.vision_radius,
+            )
+        )
+    return teams
+
+
+def seed_streams(
+    config: GameConfig, seed: Optional[int]
+) -> tuple[int, np.random.SeedSequence, np.random.SeedSequence]:
+    """Returns the seed of a game, taken from `seed`, the config or fresh
+    entropy, and the independent seeds of its map and of its agents."""
+    if seed is None:
+        seed = config.seed
+    root = np.random.SeedSequence(seed)
+    map_seed, agents_seed = root.spawn(2)
+    return root.entropy, map_seed, agents_seed  # type: ignore[return-value]
+
+
+def create_map(
+    config: GameConfig, teams: list[Team], rng: Optional[np.random.Generator] = None
+) -> GameMap:
+    LOGGER.info("Creating map...")
+    return GameMap(
+        config.width,
+        config.height,
+        config.resources["wood"],
+        config.resources["wheat"],
+        config.resources["iron"],
+        config.golds,
+        config.energy_pots,
+        [team.village for team in teams],
+        [team_config.agents for team_config in config.teams],
+        rng,
+    )
+
+
+def create_world(
+    config: GameConfig, map_seed: np.random.SeedSequence
+) -> tuple[list[Team], GameMap]:
+    """Creates the teams and the map of a game. The map is loaded from the
+    file of the config if it has one, otherwise it is taken from the map
+    cache or generated."""
+    rng = np.random.default_rng(map_seed)
+    if config.map is not None:
+        LOGGER.info("Loading map %s", config.map)
+        Tiles.team_tiles(len(config.teams) - 1)
+        game_map = GameMap.from_file(config.map, rng)
+        if game_map.matrix.shape != (config.height, config.width):
+            raise ValueError(
+                f"The map {config.map} is {game_map.height}x{game_map.width} "
+                f"but the config is {config.height}x{config.width}."
+            )
+        centers = game_map.village_centers(len(config.teams))
+        return create_teams(config, centers), game_map
+
+    teams = create_teams(config)
+    if not map_cache.is_enabled():
+        return teams, create_map(config, teams, rng)
+
+    key = map_cache.cache_key(config, map_seed)
+    cached = map_cache.load_map(key)
+    if cached is not None:
+        LOGGER.info("Map %s found in the cache", key)
+        matrix, rng_state = cached
+        rng.bit_generator.state = rng_state
+        return teams, GameMap.from_matrix(matrix, rng)
+
+    game_map = create_map(config, teams, rng)
+    map_cache.store_map(key, game_map.matrix, rng.bit_generator.state)
+    return teams, game_map
+
+
+class Simulation:
+    """Headless game engine. Owns the map, the teams and their agents and
+    advances them one round per `step`, independently of any window."""
+
+    def __init__(self, config: GameConfig, seed: Optional[int] = None):
+        self.config = config
+        self.seed, map_seed, agents_seed = seed_streams(config, seed)
+        LOGGER.info("Seed: %s", self.seed)
+        self.round = 0
+        self.winner: Optional[int] = None
+
+        self.teams, self.map = create_world(config, map_seed)
+        self.occupancy = self.map.occupancy
+        self.map_hash = MapHash(self.map)
+
+        for team in self.teams:
+            team.build_village_field(self.map)
+
+        LOGGER.info("Creating agents...")
+        team_seeds = agents_seed.spawn(len(self.teams))
+        for team, team_config, team_seed in zip(self.teams, config.teams, team_seeds):
+            self.map.generate_players(
+                team, team_config.agents, config.map_price, team_seed
+            )
+
+    @property
+    def is_finished(self) -> bool:
+        return self.winner is not None
+
+    def step(self):
+        if self.is_finished:
+            return
+
+        for team in self.teams:
+            for agent in team.agents:
+                agent.update()
+
+        self.round += 1
+        for team in self.teams:
+            team.reservations.advance()
+
+        for index, team in enumerate(self.teams):
+            if not team.resources.wanted:
+                LOGGER.info("Team %s Won!", team.id)
+                self.winner = index
+                return
+
+    def run(self, max_rounds: int = DEFAULT_MAX_ROUNDS) -> SimulationResult:
+        while not self.is_finished and self.round < max_rounds:
+            self.step()
+
+        return self.result()
+
+    def snapshot(self) -> dict[str, np.ndarray]:
+        """Arrays describing the current state, see `src.snapshot`."""
+        agents = [agent for team in self.teams for agent in team.agents]
+        return {
+            "terrain": self.map.matrix.astype(np.int8),
+            # The occupancy slots follow the order the agents were created
+            # in, which is the order of `agents`.
+            "occupancy": self.occupancy.grid,
+            "teams": np.repeat(
+                np.arange(len(self.teams)), [len(team.agents) for team in self.teams]
+            ),
+            "knowledge": np.stack([agent.map.matrix for agent in agents]),
+        }
+
+    def state_hash(self) -> int:
+        """Hash of the game map, the state of every agent and the resources
+        of every team. Two games that agree on it for every round played the
+        same."""
+        agents = [
+            (
+                agent.position.x,
+                agent.position.y,
+                agent.energy,
+                STATE_CODES[agent.state],
+                agent.collected_resource.index,
+                agent.gold,
+            )
+            for team in self.teams
+            for agent in team.agents
+        ]
+        resources = [tuple(team.resources.as_dict().values()) for team in self.teams]
+        return hash_values(
+            self.round,
+            self.map_hash.value,
+            hash_rows(np.array(agents, dtype=np.int64)),
+            hash_rows(np.array(resources, dtype=np.int64)),
+        )
+
+    def result(self) -> SimulationResult:
+        return SimulationResult(
+            winner=self.winner,
+            rounds=self.round,
+            resources=[team.resources.as_dict() for team in self.teams],
+        )
+
+
+profiling.hook(Simulation, "step", "simulation.step")
@@ -0,0 +1,148 @@
+"""Binary snapshots of games, either as one `.npz` file or appended every
+few rounds to a recording that is read back through memory maps. A snapshot
+holds the round and the arrays of `snapshot()` of the engine:
+
+- terrain: the game map, without agents.
+- occupancy: index of the agent on every cell, -1 where there is none.
+- teams: team index of every agent.
+- knowledge: the maps the agents know, one per agent.
+"""
+
+import argparse
+import json
+import os
+from typing import Protocol
+
+import numpy as np
+
+from .map import write_text
+from .tiles import Tiles
+
+META_FILE = "meta.json"
+
+
+class Snapshottable(Protocol):
+    round: int
+
+    def snapshot(self) -> dict[str, np.ndarray]: ...
+
+
+def save_snapshot(path: str, game: Snapshottable, compressed: bool = False):
+    arrays = {"round": np.array(game.round), **game.snapshot()}
+    if compressed:
+        np.savez_compressed(path, **arrays)
+    else:
+        np.savez(path, **arrays)
+
+
+def load_snapshot(path: str) -> dict[str, np.ndarray]:
+    with np.load(path) as snapshot:
+        return dict(snapshot)
+
+
+class SnapshotRecorder:
+    """Appends a snapshot of a game to a directory every `every` rounds.
+    Every array gets a raw file that grows by one frame per snapshot, and
+    `meta.json` holds the shapes and dtypes needed to map them back."""
+
+    def __init__(self, directory: str, every: int = 1):
+        self.directory = directory
+        self.every = every
+        self.frames = 0
+        self._files: dict = {}
+        self._meta: dict[str, dict] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, game: Snapshottable, force: bool = False):
+        """Takes a snapshot if the game is on a recorded round, or always if
+        `force`, e.g. for the last round of a game."""
+        if not force and game.round % self.every != 0:
+            return
+
+        arrays = {"round": np.array(game.round), **game.snapshot()}
+        if not self._files:
+            self._open(arrays)
+
+        for name, array in arrays.items():
+            self._files[name].write(np.ascontiguousarray(array).tobytes())
+        self.frames += 1
+        self._write_meta()
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def __enter__(self) -> "SnapshotRecorder":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open(self, arrays: dict[str, np.ndarray]):
+        for name, array in arrays.items():
+            self._meta[name] = {"shape": list(array.shape), "dtype": array.dtype.str}
+            self._files[name] = open(os.path.join(self.directory, f"{name}.bin"), "wb")
+
+    def _write_meta(self):
+        for f in self._files.values():
+            f.flush()
+        meta = {"frames": self.frames, "every": self.every, "arrays": self._meta}
+        with open(os.path.join(self.directory, META_FILE), "w") as f:
+            json.dump(meta, f)
+
+
+def load_recording(directory: str) -> dict[str, np.ndarray]:
+    """Maps every array of a recording read-only, with the frames on the
+    first axis. Nothing is read until the frames are indexed."""
+    with open(os.path.join(directory, META_FILE)) as f:
+        meta = json.load(f)
+
+    return {
+        name: np.memmap(
+            os.path.join(directory, f"{name}.bin"),
+            dtype=np.dtype(array["dtype"]),
+            mode="r",
+            shape=(meta["frames"], *array["shape"]),
+        )
+        for name, array in meta["arrays"].items()
+    }
+
+
+def export_text(arrays: dict[str, np.ndarray], directory: str):
+    """Writes the game map of a snapshot, with the agents drawn on it, as
+    `gamemap.txt` and every knowledge map as `<index>_map.txt`."""
+    os.makedirs(directory, exist_ok=True)
+    terrain = np.array(arrays["terrain"])
+    occupancy = np.asarray(arrays["occupancy"])
+    teams = np.asarray(arrays["teams"])
+    agent_tiles = np.array(
+        [Tiles.team_tiles(team)[1].index for team in range(int(teams.max()) + 1)]
+    )
+    occupied = occupancy >= 0
+    terrain[occupied] = agent_tiles[teams[occupancy[occupied]]]
+    write_text(os.path.join(directory, "gamemap.txt"), terrain)
+    for index, knowledge in enumerate(arrays["knowledge"]):
+        write_text(os.path.join(directory, f"{index}_map.txt"), knowledge)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exports a snapshot, or a frame of a recording, as text maps"
+    )
+    parser.add_argument("source", help=".npz snapshot or recording directory")
+    parser.add_argument("output", help="directory to write the text maps to")
+    parser.add_argument(
+        "--frame", type=int, default=-1, help="frame of a recording, the last if unset"
+    )
+    args = parser.parse_args()
+
+    if os.path.isdir(args.source):
+        arrays = {k: v[args.frame] for k, v in load_recording(args.source).items()}
+    else:
+        arrays = load_snapshot(args.source)
+    export_text(arrays, args.output)
+
+
+if __name__ == "__main__":
+    main()
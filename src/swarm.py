@@ -0,0 +1,687 @@
+import argparse
+from typing import Callable, Optional
+
+import numpy as np
+
+from . import profiling
+from .agent import State
+from .config import GameConfig, load_config
+from .hashing import MapHash, hash_rows, hash_values
+from .logger import LOGGER
+from .map import dilate
+from .simulation import (
+    DEFAULT_MAX_ROUNDS,
+    SimulationResult,
+    create_world,
+    seed_streams,
+)
+from .tiles import Tiles
+from .types import Coords
+
+# Agent states are kept as small integers, in the order of `State`.
+STATES = list(State)
+GATHERING_RESOURCE = STATES.index(State.GATHERING_RESOURCE)
+GATHERING_ENERGY_POT = STATES.index(State.GATHERING_ENERGY_POT)
+STORING_RESOURCE = STATES.index(State.STORING_RESOURCE)
+SEARCHING_FOR_RESOURCE = STATES.index(State.SEARCHING_FOR_RESOURCE)
+SEARCHING_FOR_ENERGY_POT = STATES.index(State.SEARCHING_FOR_ENERGY_POT)
+
+NO_CELL = -1
+UNREACHABLE = np.iinfo(np.int64).max
+
+
+def _offsets(radius: int, include_center: bool) -> np.ndarray:
+    """Offsets of the cells within `radius` in each axis, as (K, 2) in
+    row-major order."""
+    steps = np.arange(-radius, radius + 1)
+    offsets = np.stack(np.meshgrid(steps, steps, indexing="ij"), axis=-1)
+    offsets = offsets.reshape(-1, 2)
+    if not include_center:
+        offsets = offsets[(offsets != 0).any(axis=1)]
+    return offsets
+
+
+class Swarm:
+    """Headless engine with the rules of `Simulation` for swarms of
+    thousands of agents. The state of the agents lives in arrays indexed by
+    agent instead of `Agent` objects, and every tick updates them in a few
+    batched phases.
+
+    Every agent knows its own map and buys its teammates' maps like in the
+    object model, which takes a byte per cell and agent. The moves follow
+    the same rules: shortest moves to the target, around the agents in the
+    way, waiting for an agent standing on the target before stepping aside,
+    and down the village distance field on the way home. Agents act
+    together instead of one after another, so when several want the same
+    cell or resource the lowest index gets it and the others choose again.
+    The games are not identical to the object model's, but they are won as
+    often and in about as many rounds, see `tests/test_swarm.py`."""
+
+    # Bound on the agents x cells arrays built at once.
+    chunk_size = 1 << 22
+    # Ticks to wait for an agent standing on the target before stepping aside.
+    patience = 2
+
+    def __init__(self, config: GameConfig, seed: Optional[int] = None):
+        self.config = config
+        # The map and the starting positions come from the same stream as
+        # in `Simulation`, so both engines start a seed on the same map.
+        self.seed, map_seed, agents_seed = seed_streams(config, seed)
+        LOGGER.info("Seed: %s", self.seed)
+        self.rng = np.random.default_rng(agents_seed)
+        self.round = 0
+        self.winner: Optional[int] = None
+
+        self.teams, self.map = create_world(config, map_seed)
+        self.map_hash = MapHash(self.map)
+        for team in self.teams:
+            team.build_village_field(self.map)
+
+        self.terrain = self.map.matrix
+        self.first_terrain = self.terrain.copy()
+        self.height, self.width = self.terrain.shape
+        self.size = self.height * self.width
+        self.village_codes = np.array([t.village.tile.index for t in self.teams])
+
+        LOGGER.info("Creating agents...")
+        teams = len(self.teams)
+        self.team = np.repeat(np.arange(teams), [t.agents for t in config.teams])
+        self.count = len(self.team)
+        self.move_range = np.array([t.move_range for t in self.teams])[self.team]
+        self.vision = np.array([t.vision_radius for t in self.teams])[self.team]
+
+        self.occupancy = np.full(self.terrain.shape, NO_CELL, dtype=np.int32)
+        self.positions = self._place_agents()
+        self.energy = np.full(self.count, 100, dtype=np.int32)
+        self.state = np.full(self.count, SEARCHING_FOR_RESOURCE, dtype=np.int8)
+        self.carried = np.full(self.count, Tiles.EMPTY.index, dtype=np.int8)
+        self.gold = np.zeros(self.count, dtype=np.int32)
+        centers = [(t.village.center.x, t.village.center.y) for t in self.teams]
+        self.targets = np.array(centers, dtype=np.int64)[self.team]
+        self.has_explore_target = np.zeros(self.count, dtype=bool)
+        self.waited = np.zeros(self.count, dtype=np.int32)
+        # Flat index of the cell every agent has reserved, or NO_CELL, and
+        # the round the reservation expires at, like `Reservations`.
+        self.reserved = np.full(self.count, NO_CELL, dtype=np.int64)
+        self.reserved_until = np.zeros(self.count, dtype=np.int64)
+        self.reservation_ttl = config.width + config.height
+        self.wanted = np.zeros((teams, len(Tiles.registry)), dtype=bool)
+
+        # What every agent knows about the map. Agents start out knowing
+        # the square around their village.
+        self.knowledge = np.full(
+            (self.count, self.height, self.width), Tiles.UNKNOWN.index, dtype=np.int8
+        )
+        radius = self.map.village_radius
+        for index, team in enumerate(self.teams):
+            center = team.village.center
+            village = (
+                slice(max(center.x - radius, 0), center.x + radius + 1),
+                slice(max(center.y - radius, 0), center.y + radius + 1),
+            )
+            members = self.team == index
+            self.knowledge[members, village[0], village[1]] = self.terrain[village]
+        # Cells every agent does not know yet. Agents that know the whole map
+        # have nothing left to explore.
+        self.unknown_cells = np.count_nonzero(
+            self.knowledge.reshape(self.count, -1) == Tiles.UNKNOWN.index, axis=1
+        )
+
+    def _place_agents(self) -> np.ndarray:
+        # Agents start around their village like in the object model.
+        positions = np.empty((self.count, 2), dtype=np.int64)
+        for index, team in enumerate(self.teams):
+            agents = np.flatnonzero(self.team == index)
+            positions[agents] = self.map.sample_free_cells(
+                team.village.center,
+                self.map.village_radius,
+                len(agents),
+                self.occupancy != NO_CELL,
+            )
+            self.occupancy[positions[agents, 0], positions[agents, 1]] = agents
+        return positions
+
+    @property
+    def is_finished(self) -> bool:
+        return self.winner is not None
+
+    def step(self):
+        if self.is_finished:
+            return
+
+        self._update_wanted()
+        x, y = self.positions.T
+        under = self.terrain[x, y]
+        at_target = (self.positions == self.targets).all(axis=1)
+        # Agents that already acted this tick and do not move.
+        done = np.zeros(self.count, dtype=bool)
+
+        exhausted = (self.energy < 50) & ~np.isin(
+            self.state, (GATHERING_ENERGY_POT, SEARCHING_FOR_ENERGY_POT)
+        )
+        self.state[exhausted] = SEARCHING_FOR_ENERGY_POT
+
+        on_gold = under == Tiles.GOLD.index
+        self.gold[on_gold] += 1
+        self._clear_tiles(on_gold)
+        done |= on_gold
+
+        done |= self._trade_maps(~done & (self.gold > self.config.map_price))
+
+        home = (self.state == STORING_RESOURCE) & ~done
+        home &= under == self.village_codes[self.team]
+        for agent in np.flatnonzero(home).tolist():
+            team = self.teams[self.team[agent]]
+            team.resources.add(int(self.carried[agent]))
+        self.carried[home] = Tiles.EMPTY.index
+        self.state[home] = SEARCHING_FOR_RESOURCE
+        done |= home
+        self._update_wanted()
+
+        arrived = (self.state == GATHERING_RESOURCE) & at_target & ~done
+        needed = self.wanted[self.team, under]
+        picked = arrived & needed
+        self.carried[picked] = under[picked]
+        self._clear_tiles(picked)
+        self.state[picked] = STORING_RESOURCE
+        self.state[arrived & ~needed] = SEARCHING_FOR_RESOURCE
+        self._release(arrived)
+        done |= arrived
+
+        arrived = (self.state == GATHERING_ENERGY_POT) & at_target & ~done
+        drank = arrived & (under == Tiles.ENERGY_POT.index)
+        self.energy[drank] = np.minimum(
+            self.energy[drank] + self.config.energy_pots_energy, 100
+        )
+        self._clear_tiles(drank)
+        self.state[drank] = SEARCHING_FOR_RESOURCE
+        self.state[arrived & ~drank] = SEARCHING_FOR_ENERGY_POT
+        self._release(arrived)
+        done |= arrived
+
+        # Agents that stored a resource look for the next one right away.
+        searching = self.state == SEARCHING_FOR_RESOURCE
+        self._locate(searching & (~done | home), GATHERING_RESOURCE, self._wanted_codes)
+        self._locate(
+            (self.state == SEARCHING_FOR_ENERGY_POT) & ~done,
+            GATHERING_ENERGY_POT,
+            lambda team: [Tiles.ENERGY_POT.index],
+        )
+        exploring = np.isin(
+            self.state, (SEARCHING_FOR_RESOURCE, SEARCHING_FOR_ENERGY_POT)
+        )
+        self._explore(exploring & ~done)
+
+        storing = (self.state == STORING_RESOURCE) & ~done
+        moving = ~done & ~storing
+        moved = np.concatenate(
+            (self._move_to_targets(moving), self._move_to_villages(storing))
+        )
+        self._look_around(moved)
+
+        self.energy -= 1
+        self.round += 1
+
+        for index, team in enumerate(self.teams):
+            if not team.resources.wanted:
+                LOGGER.info("Team %s Won!", team.id)
+                self.winner = index
+                return
+
+    def run(self, max_rounds: int = DEFAULT_MAX_ROUNDS) -> SimulationResult:
+        while not self.is_finished and self.round < max_rounds:
+            self.step()
+
+        return self.result()
+
+    def snapshot(self) -> dict[str, np.ndarray]:
+        """Arrays describing the current state, see `src.snapshot`."""
+        return {
+            "terrain": self.terrain.astype(np.int8),
+            "occupancy": self.occupancy,
+            "teams": self.team,
+            "knowledge": self.knowledge,
+        }
+
+    def state_hash(self) -> int:
+        """Hash of the game map, the state of every agent and the resources
+        of every team, like `Simulation.state_hash`."""
+        agents = np.column_stack(
+            (self.positions, self.energy, self.state, self.carried, self.gold)
+        )
+        resources = [tuple(team.resources.as_dict().values()) for team in self.teams]
+        return hash_values(
+            self.round,
+            self.map_hash.value,
+            hash_rows(agents.astype(np.int64)),
+            hash_rows(np.array(resources, dtype=np.int64)),
+        )
+
+    def result(self) -> SimulationResult:
+        return SimulationResult(
+            winner=self.winner,
+            rounds=self.round,
+            resources=[team.resources.as_dict() for team in self.teams],
+        )
+
+    def _update_wanted(self):
+        self.wanted[:] = False
+        for index, team in enumerate(self.teams):
+            self.wanted[index, self._wanted_codes(index)] = True
+
+    def _wanted_codes(self, team: int) -> list[int]:
+        return self.teams[team].resources.wanted_codes
+
+    def _chunks(self, agents: np.ndarray, cells: int) -> list[np.ndarray]:
+        # Groups of agents, in order, whose arrays of `cells` cells per agent
+        # fit in `chunk_size`.
+        chunk = max(self.chunk_size // cells, 1)
+        return [agents[start : start + chunk] for start in range(0, len(agents), chunk)]
+
+    def _clear_tiles(self, agents: np.ndarray):
+        # Picked up tiles leave the terrain and the picking agent's map.
+        for agent in np.flatnonzero(agents).tolist():
+            x, y = self.positions[agent].tolist()
+            self.map.set_tile(Coords(x, y), Tiles.EMPTY)
+            self.knowledge[agent, x, y] = Tiles.EMPTY.index
+
+    def _reserve(self, agents: np.ndarray, cells: np.ndarray):
+        self.reserved[agents] = cells
+        self.reserved_until[agents] = self.round + self.reservation_ttl
+
+    def _release(self, agents: np.ndarray):
+        self.reserved[agents] = NO_CELL
+
+    def _reserved_cells(self, team: int) -> np.ndarray:
+        """Flat mask of the cells the agents of `team` hold a live
+        reservation on."""
+        live = (self.team == team) & (self.reserved != NO_CELL)
+        live &= self.reserved_until > self.round
+        reserved = np.zeros(self.size, dtype=bool)
+        reserved[self.reserved[live]] = True
+        return reserved
+
+    def _trade_maps(self, agents: np.ndarray) -> np.ndarray:
+        """Every agent in `agents` buys from its first neighboring teammate,
+        in row-major order, the cells that teammate knows and it does not.
+        Returns the agents that bought something, like `Agent.trade_maps`."""
+        traded = np.zeros(self.count, dtype=bool)
+        buyers = np.flatnonzero(agents)
+        if len(buyers) == 0:
+            return traded
+
+        offsets = _offsets(1, include_center=False)
+        x = self.positions[buyers, 0, None] + offsets[:, 0]
+        y = self.positions[buyers, 1, None] + offsets[:, 1]
+        inside = (x >= 0) & (x < self.height) & (y >= 0) & (y < self.width)
+        neighbors = np.where(
+            inside,
+            self.occupancy[x.clip(0, self.height - 1), y.clip(0, self.width - 1)],
+            NO_CELL,
+        )
+        teammates = neighbors != NO_CELL
+        teammates &= self.team[neighbors] == self.team[buyers, None]
+        found = teammates.any(axis=1)
+        buyers = buyers[found]
+        sellers = neighbors[found, teammates[found].argmax(axis=1)]
+        if len(buyers) == 0:
+            return traded
+
+        # Everyone buys what their seller knew at the start of the trades.
+        maps = self.knowledge[sellers]
+        unknown = Tiles.UNKNOWN.index
+        new = (maps != unknown) & (self.knowledge[buyers] == unknown)
+        bought = new.any(axis=(1, 2))
+        buyers, sellers = buyers[bought], sellers[bought]
+        self.knowledge[buyers] = np.where(
+            new[bought], maps[bought], self.knowledge[buyers]
+        )
+        self.unknown_cells[buyers] -= np.count_nonzero(new[bought], axis=(1, 2))
+
+        price = self.config.map_price
+        self.gold[buyers] -= price
+        np.add.at(self.gold, sellers, price)
+        traded[buyers] = True
+        return traded
+
+    def _nearest(
+        self, agents: np.ndarray, codes: list[int], reserved: np.ndarray
+    ) -> np.ndarray:
+        """Flat index of the closest cell every agent knows to hold one of
+        the tiles in `codes` and that is not `reserved`, or NO_CELL. Distance
+        is Chebyshev, then Manhattan, then position, like `Map.nearest`."""
+        wanted = np.zeros(len(Tiles.registry), dtype=bool)
+        wanted[codes] = True
+        # Tiles only ever leave the terrain, so the agents can only know of
+        # one where the starting terrain has it.
+        cells = np.flatnonzero(wanted[self.first_terrain].ravel() & ~reserved)
+        nearest = np.full(len(agents), NO_CELL, dtype=np.int64)
+        if len(cells) == 0:
+            return nearest
+
+        maps = self.knowledge.reshape(self.count, -1)
+        start = 0
+        for part in self._chunks(agents, len(cells)):
+            match = wanted[maps[part[:, None], cells]]
+            rows = np.flatnonzero(match.any(axis=1))
+            columns = np.flatnonzero(match.any(axis=0))
+            if len(rows) > 0:
+                match = match[np.ix_(rows, columns)]
+                x, y = np.divmod(cells[columns], self.width)
+                dx = abs(self.positions[part[rows], 0, None] - x)
+                dy = abs(self.positions[part[rows], 1, None] - y)
+                cost = np.maximum(dx, dy) * (self.height + self.width) + dx + dy
+                # Cells are in row-major order, so the first of equal costs
+                # is the one with the lowest position.
+                cost = np.where(match, cost, UNREACHABLE)
+                nearest[start + rows] = cells[columns[cost.argmin(axis=1)]]
+            start += len(part)
+        return nearest
+
+    def _locate(
+        self,
+        agents: np.ndarray,
+        state: int,
+        codes: Callable[[int], list[int]],
+    ):
+        """Sends the `agents` to the closest cell they know to hold one of
+        the tiles in `codes(team)` and that no teammate reserved, and
+        reserves it. Agents whose pick was taken by a lower index choose
+        again, as if they had come after it."""
+        for team in range(len(self.teams)):
+            members = np.flatnonzero(agents & (self.team == team))
+            team_codes = codes(team)
+            if len(members) == 0 or not team_codes:
+                continue
+
+            reserved = self._reserved_cells(team)
+            while len(members) > 0:
+                picks = self._nearest(members, team_codes, reserved)
+                found = picks != NO_CELL
+                members, picks = members[found], picks[found]
+                if len(members) == 0:
+                    break
+
+                # Members are in index order, so the first pick of a cell
+                # belongs to the agent with the lowest index.
+                _, first = np.unique(picks, return_index=True)
+                winners, won = members[first], picks[first]
+
+                self._reserve(winners, won)
+                reserved[won] = True
+                self.targets[winners] = np.stack(np.divmod(won, self.width), axis=1)
+                self.has_explore_target[winners] = False
+                self.state[winners] = state
+                members = np.delete(members, first)
+
+    def _explore(self, agents: np.ndarray):
+        """Keeps the agents heading to cells that are still on the frontier of
+        their map and sends the others to a new frontier cell, like
+        `Agent.set_explore_target`: the closest ones, then the ones with the
+        most unknown cells in sight, then a random one. The frontier is
+        searched in windows of doubling radius around the agents."""
+        members = np.flatnonzero(agents)
+        if len(members) == 0:
+            return
+
+        targets = self.targets[members]
+        keep = self.has_explore_target[members]
+        keep &= (targets != self.positions[members]).any(axis=1)
+        keep &= self._on_frontier(members, targets)
+        members = members[~keep]
+        explored = self.unknown_cells[members] == 0
+        self.has_explore_target[members[explored]] = False
+        members = members[~explored]
+
+        radius = 8
+        while len(members) > 0:
+            searched = []
+            margin = max(int(self.vision[members].max()), 1)
+            cells = (2 * (radius + margin) + 1) ** 2
+            for chunk in self._chunks(members, cells):
+                searched.append(self._explore_window(chunk, radius, margin))
+            members = members[~np.concatenate(searched)]
+
+            if radius >= max(self.height, self.width):
+                # The windows covered the whole map, there is no frontier.
+                self.has_explore_target[members] = False
+                break
+            radius = min(2 * radius, max(self.height, self.width))
+
+    def _explore_window(
+        self, agents: np.ndarray, radius: int, margin: int
+    ) -> np.ndarray:
+        """Sends every agent to the best frontier cell within `radius` of it,
+        if there is one. A match at Chebyshev distance <= radius is the best
+        on the whole map, since every cell outside the window is farther.
+        Returns which agents found one."""
+        patches, x, y = self._patches(agents, radius + margin)
+        unknown = patches == Tiles.UNKNOWN.index
+        frontier = dilate(unknown) & ~unknown & (patches != Tiles.INVALID.index)
+        gain = self._count_around(unknown, self.vision[agents])
+        inner = slice(margin, -margin)
+        frontier, gain = frontier[:, inner, inner], gain[:, inner, inner]
+        frontier[:, radius, radius] = False
+
+        steps = abs(np.arange(-radius, radius + 1))
+        distance = np.maximum(steps[:, None], steps[None, :]).astype(np.int64)
+        # Gains are below the size of the window, so a closer cell always
+        # wins.
+        key = distance * patches[0].size - gain
+        key = np.where(frontier, key, UNREACHABLE).reshape(len(agents), -1)
+        best = key.min(axis=1)
+        found = best != UNREACHABLE
+        agents, key, best = agents[found], key[found], best[found]
+        x, y = x[found, inner], y[found, inner]
+        if len(agents) == 0:
+            return found
+
+        # The ties are in row-major order, pick one of them at random.
+        ties = key == best[:, None]
+        choice = self.rng.integers(ties.sum(axis=1))
+        chosen = (ties.cumsum(axis=1) > choice[:, None]).argmax(axis=1)
+        row, column = np.divmod(chosen, 2 * radius + 1)
+        rows = np.arange(len(agents))
+
+        self._release(agents)
+        self.targets[agents] = np.stack((x[rows, row], y[rows, column]), axis=1)
+        self.has_explore_target[agents] = True
+        return found
+
+    def _patches(
+        self, agents: np.ndarray, radius: int
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The cells within `radius` of every agent on its map, of shape
+        (agents, 2 * radius + 1, 2 * radius + 1), with invalid tiles past the
+        edges of the map. Also returns the rows and the columns of the map
+        they come from, of shape (agents, 2 * radius + 1)."""
+        steps = np.arange(-radius, radius + 1)
+        x = self.positions[agents, 0, None] + steps
+        y = self.positions[agents, 1, None] + steps
+        patches = self.knowledge[
+            agents[:, None, None],
+            x.clip(0, self.height - 1)[:, :, None],
+            y.clip(0, self.width - 1)[:, None, :],
+        ]
+        outside = ((x < 0) | (x >= self.height))[:, :, None]
+        outside = outside | ((y < 0) | (y >= self.width))[:, None, :]
+        patches[outside] = Tiles.INVALID.index
+        return patches, x, y
+
+    def _on_frontier(self, agents: np.ndarray, cells: np.ndarray) -> np.ndarray:
+        """Whether each of the `cells`, one per agent as (x, y) rows, is known
+        to its agent and next to a cell it does not know."""
+        unknown = Tiles.UNKNOWN.index
+        x, y = cells.T
+        frontier = self.knowledge[agents, x, y] != unknown
+        next_to_unknown = np.zeros(len(agents), dtype=bool)
+        for dx, dy in _offsets(1, include_center=False).tolist():
+            nx, ny = x + dx, y + dy
+            inside = (nx >= 0) & (nx < self.height) & (ny >= 0) & (ny < self.width)
+            seen = self.knowledge[
+                agents, nx.clip(0, self.height - 1), ny.clip(0, self.width - 1)
+            ]
+            next_to_unknown |= inside & (seen == unknown)
+        return frontier & next_to_unknown
+
+    @staticmethod
+    def _count_around(masks: np.ndarray, radii: np.ndarray) -> np.ndarray:
+        """Number of set cells of every mask, one per radius, in the square
+        of that radius around every cell, clipped to the mask, like
+        `Map.count_unknown_around`."""
+        count, height, width = masks.shape
+        sums = np.zeros((count, height + 1, width + 1), dtype=np.int32)
+        sums[:, 1:, 1:] = masks.cumsum(axis=1, dtype=np.int32).cumsum(axis=2)
+
+        rows = np.arange(height)[None, :]
+        columns = np.arange(width)[None, :]
+        radii = radii[:, None]
+        x0 = (rows - radii).clip(0, height)[:, :, None]
+        x1 = (rows + radii + 1).clip(0, height)[:, :, None]
+        y0 = (columns - radii).clip(0, width)[:, None, :]
+        y1 = (columns + radii + 1).clip(0, width)[:, None, :]
+        agents = np.arange(count)[:, None, None]
+        return (
+            sums[agents, x1, y1]
+            - sums[agents, x0, y1]
+            - sums[agents, x1, y0]
+            + sums[agents, x0, y0]
+        )
+
+    def _window(self, members: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Cells within the move range of every member as (x, y) arrays of
+        shape (members, K) in row-major order, and which of them are on the
+        map and in range. The others point to the member's own cell."""
+        offsets = _offsets(int(self.move_range[members].max()), include_center=True)
+        positions = self.positions[members]
+        x = positions[:, 0, None] + offsets[:, 0]
+        y = positions[:, 1, None] + offsets[:, 1]
+        in_range = (abs(offsets) <= self.move_range[members, None, None]).all(axis=2)
+        in_range &= (x >= 0) & (x < self.height) & (y >= 0) & (y < self.width)
+        x = np.where(in_range, x, positions[:, 0, None])
+        y = np.where(in_range, y, positions[:, 1, None])
+        return x, y, in_range
+
+    def _move_to_targets(self, agents: np.ndarray) -> np.ndarray:
+        agents = agents & (self.positions != self.targets).any(axis=1)
+        return self._move(np.flatnonzero(agents), self._step_to_target)
+
+    def _move_to_villages(self, agents: np.ndarray) -> np.ndarray:
+        return self._move(np.flatnonzero(agents), self._step_to_village)
+
+    def _step_to_target(self, members: np.ndarray) -> np.ndarray:
+        """Next cell of every member on a shortest way to its target, like
+        `PathPlanner.next_step` on a map where nothing is impassable. An
+        agent goes around the agents in its way, and waits up to `patience`
+        ticks for an agent standing on its target before stepping aside."""
+        x, y, in_range = self._window(members)
+        target = self.targets[members]
+        dx = abs(x - target[:, 0, None])
+        dy = abs(y - target[:, 1, None])
+        cost = np.maximum(dx, dy) * (self.height + self.width) + dx + dy
+        free = in_range & (self.occupancy[x, y] == NO_CELL)
+        cost = np.where(free, cost, UNREACHABLE)
+        best = cost.argmin(axis=1)
+        rows = np.arange(len(members))
+
+        distance = abs(self.positions[members] - target).max(axis=1)
+        goal_blocked = distance <= self.move_range[members]
+        goal_blocked &= self.occupancy[target[:, 0], target[:, 1]] != NO_CELL
+        self.waited[members[goal_blocked]] += 1
+
+        moving = cost[rows, best] != UNREACHABLE
+        moving &= ~goal_blocked | (self.waited[members] > self.patience)
+        cells = x[rows, best] * self.width + y[rows, best]
+        return np.where(moving, cells, NO_CELL)
+
+    def _step_to_village(self, members: np.ndarray) -> np.ndarray:
+        """Next cell of every member down its team's village distance field,
+        like `DistanceField.next_step`."""
+        x, y, in_range = self._window(members)
+        distances = np.empty(x.shape, dtype=np.int64)
+        teams = self.team[members]
+        for index, team in enumerate(self.teams):
+            rows = teams == index
+            assert team.village_field is not None
+            distances[rows] = team.village_field.distances[x[rows], y[rows]]
+
+        current = distances[:, len(distances[0]) // 2]
+        free = in_range & (self.occupancy[x, y] == NO_CELL)
+        distances = np.where(free, distances, UNREACHABLE)
+        best = distances.argmin(axis=1)
+        rows = np.arange(len(members))
+
+        moving = distances[rows, best] < current
+        cells = x[rows, best] * self.width + y[rows, best]
+        return np.where(moving, cells, NO_CELL)
+
+    def _move(
+        self, members: np.ndarray, choose: Callable[[np.ndarray], np.ndarray]
+    ) -> np.ndarray:
+        """Moves every agent in `members` to the flat cell `choose` gives it,
+        if any. When several agents choose the same cell the lowest index
+        gets it and the others choose again with the cell taken, as if they
+        had moved after it. Returns the agents that moved."""
+        moved = []
+        while len(members) > 0:
+            cells = choose(members)
+            candidates = np.flatnonzero(cells != NO_CELL)
+            _, first = np.unique(cells[candidates], return_index=True)
+            movers = candidates[first]
+
+            agents = members[movers]
+            old = self.positions[agents]
+            new = np.stack(np.divmod(cells[movers], self.width), axis=1)
+            self.occupancy[old[:, 0], old[:, 1]] = NO_CELL
+            self.occupancy[new[:, 0], new[:, 1]] = agents
+            self.positions[agents] = new
+            self.waited[agents] = 0
+            moved.append(agents)
+
+            members = members[np.delete(candidates, first)]
+        return np.concatenate(moved) if moved else members
+
+    def _look_around(self, agents: np.ndarray):
+        if len(agents) == 0:
+            return
+
+        offsets = _offsets(int(self.vision[agents].max()), include_center=True)
+        positions = self.positions[agents]
+        x = positions[:, 0, None] + offsets[:, 0]
+        y = positions[:, 1, None] + offsets[:, 1]
+        visible = (abs(offsets) <= self.vision[agents, None, None]).all(axis=2)
+        visible &= (x >= 0) & (x < self.height) & (y >= 0) & (y < self.width)
+
+        seers = np.broadcast_to(agents[:, None], x.shape)[visible]
+        x, y = x[visible], y[visible]
+        seen = self.knowledge[seers, x, y] == Tiles.UNKNOWN.index
+        self.unknown_cells -= np.bincount(seers[seen], minlength=self.count)
+        self.knowledge[seers, x, y] = self.terrain[x, y]
+
+
+profiling.hook(Swarm, "step", "swarm.step")
+profiling.hook(Swarm, "_trade_maps", "swarm.trade_maps")
+profiling.hook(Swarm, "_locate", "swarm.locate")
+profiling.hook(Swarm, "_explore", "swarm.explore")
+profiling.hook(Swarm, "_move", "swarm.move")
+profiling.hook(Swarm, "_look_around", "swarm.look_around")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs a game of the swarm engine.")
+    parser.add_argument("config", help="configuration file")
+    parser.add_argument("--seed", type=int, help="seed of the game")
+    parser.add_argument(
+        "--max-rounds",
+        type=int,
+        default=DEFAULT_MAX_ROUNDS,
+        help="round limit of the game",
+    )
+    args = parser.parse_args()
+
+    config = load_config(args.config, max_agents=None)
+    print(Swarm(config, args.seed).run(args.max_rounds))
+
+
+if __name__ == "__main__":
+    main()
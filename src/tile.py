@@ -1,68 +1,71 @@
+from math import ceil
+from typing import Optional
+
 import arcade
 import arcade.color as colors
-from arcade.shape_list import create_polygon
+import numpy as np
+import pyglet
 from arcade.types import Color
 
-from src.types import Coords
-
+from . import profiling
 from .constants import *
-from .tiles import Tiles, TileType
+from .tiles import Tiles
 
 tile_color_mapper: dict[int, Color] = {
     Tiles.EMPTY.index: colors.GREEN,
     Tiles.UNKNOWN.index: colors.BLACK,
-    Tiles.VILLAGE_1.index: colors.PURPLE,
-    Tiles.VILLAGE_2.index: colors.BRONZE,
     Tiles.WOOD.index: colors.BROWN,
     Tiles.IRON.index: colors.GRAY,
     Tiles.WHEAT.index: colors.WHEAT,
     Tiles.GOLD.index: colors.GOLD,
     Tiles.ENERGY_POT.index: colors.PEAR,
-    Tiles.AGENT_1.index: colors.BLUE,
-    Tiles.AGENT_2.index: colors.RED,
 }
 
+# Village and agent colors of the teams, in team order. Teams past the end
+# of the palette reuse its colors from the start.
+team_colors: list[tuple[Color, Color]] = [
+    (colors.PURPLE, colors.BLUE),
+    (colors.BRONZE, colors.RED),
+    (colors.TEAL, colors.ORANGE),
+    (colors.MAROON, colors.YELLOW),
+    (colors.NAVY_BLUE, colors.CYAN),
+    (colors.OLIVE, colors.MAGENTA),
+    (colors.SALMON, colors.WHITE),
+    (colors.LAVENDER, colors.PINK),
+]
+
+
+def tile_color(index: int) -> Color:
+    """Color of the tile type with the given index. Tile types without a
+    color are drawn like unknown tiles."""
+    for team, (village, agent) in enumerate(zip(Tiles.villages, Tiles.agents)):
+        if index == village.index:
+            return team_colors[team % len(team_colors)][0]
+        if index == agent.index:
+            return team_colors[team % len(team_colors)][1]
+    return tile_color_mapper.get(index, colors.BLACK)
 
-class Tile:
-    width: float
-    height: float
 
-    def __init__(
-        self,
-        coords: Coords,
-        tile_type: TileType,
-    ):
-        self.coords = coords
-        self.symbol = tile_type.symbol
-        self.color = tile_color_mapper[tile_type.index]
-        self.data_coords = self._precompute_data_coords(coords.x, coords.y)
-        self.vertices = self._precompute_vertices(*self.data_coords)
-        self._shape = create_polygon(self.vertices, self.color)
-
-    def set_tile_type(self, tile_type: TileType):
-        self.symbol = tile_type.symbol
-        self.color = tile_color_mapper[tile_type.index]
-
-    @property
-    def shape(self):
-        return self._shape
-
-    def render(self):
-        arcade.draw_polygon_filled(self.vertices, self.color)
-
-        arcade.draw_text(
-            self.symbol,
-            self.data_coords[0],
-            self.data_coords[1],
-            colors.BLACK,
-            16,
-            width=20,
-            align="center",
-            anchor_x="center",
+# Index -> RGBA lookup table, rebuilt when team tiles are registered.
+tile_color_table = np.empty((0, 4), dtype=np.uint8)
+
+
+def to_colors(matrix: np.ndarray) -> np.ndarray:
+    global tile_color_table
+    if len(tile_color_table) != len(Tiles.registry):
+        tile_color_table = np.array(
+            [tile_color(tile_type.index) for tile_type in Tiles.registry],
+            dtype=np.uint8,
         )
+    return tile_color_table[matrix]
+
 
-    def render_border(self, color: Color):
-        arcade.draw_polygon_outline(self.vertices, color, 4)
+class Tile:
+    """Size in pixels of the cells of the board, set by the window to fit
+    the map."""
+
+    width: float
+    height: float
 
     @classmethod
     def _precompute_data_coords(cls, x: int, y: int) -> tuple[int, int]:
@@ -70,12 +73,71 @@ class Tile:
         y = int(y * cls.height + WINDOW_PADDING + BOARD_PADDING + cls.height / 2)
         return x, y
 
-    @classmethod
-    def _precompute_vertices(cls, x: int, y: int) -> list[tuple[float, float]]:
-        vertices = [
-            (x - cls.width / 2, y - cls.height / 2),
-            (x - cls.width / 2, y + cls.height / 2),
-            (x + cls.width / 2, y + cls.height / 2),
-            (x + cls.width / 2, y - cls.height / 2),
-        ]
-        return vertices
+
+class Board:
+    """Draws a matrix of tile indices in a few draw calls. Every cell is a
+    sprite of one sprite list and its symbol a text of one batch, and only
+    the cells that differ from the previous frame are updated, so the GPU
+    buffers change by a handful of tiles per round."""
+
+    # Symbols of tiles smaller than this many pixels would be unreadable
+    # and are not drawn at all.
+    min_symbol_size = 14
+
+    def __init__(self, height: int, width: int):
+        self.height = height
+        self.width = width
+        self.shape = (height, width)
+        self.shown: Optional[np.ndarray] = None
+        self.sprites = arcade.SpriteList(capacity=height * width)
+        self.symbols = pyglet.graphics.Batch()
+        self.texts: list[arcade.Text] = []
+        draw_symbols = min(Tile.width, Tile.height) >= self.min_symbol_size
+
+        size = ceil(Tile.width), ceil(Tile.height)
+        for x in range(height):
+            for y in range(width):
+                center = Tile._precompute_data_coords(x, y)
+                self.sprites.append(arcade.SpriteSolidColor(*size, *center))
+                if draw_symbols:
+                    self.texts.append(
+                        arcade.Text(
+                            "",
+                            *center,
+                            colors.BLACK,
+                            min(16, int(Tile.height * 0.6)),
+                            anchor_x="center",
+                            anchor_y="center",
+                            batch=self.symbols,
+                        )
+                    )
+
+    def update(self, matrix: np.ndarray):
+        """Shows `matrix`, touching only the tiles that changed since the
+        last update."""
+        matrix = matrix.ravel()
+        if self.shown is None:
+            dirty = np.arange(len(matrix))
+        else:
+            dirty = np.flatnonzero(matrix != self.shown)
+        self.shown = matrix.copy()
+        if len(dirty) == 0:
+            return
+
+        codes = matrix[dirty]
+        tile_colors = to_colors(codes).tolist()
+        for index, color in zip(dirty.tolist(), tile_colors):
+            self.sprites[index].color = tuple(color)
+
+        if self.texts:
+            symbols = Tiles.to_symbols(codes).tolist()
+            for index, symbol in zip(dirty.tolist(), symbols):
+                self.texts[index].text = symbol
+
+    def draw(self):
+        self.sprites.draw()
+        if self.texts:
+            self.symbols.draw()
+
+
+profiling.hook(Board, "update", "board.update")
@@ -1,8 +1,16 @@
 from dataclasses import dataclass
+from typing import ClassVar
+
+import numpy as np
 
 
 @dataclass
 class TileType:
+    """A kind of tile. There is a single instance per index, registered in
+    `Tiles`, so tile types compare by identity and equal their index, which
+    is also their hash and what they turn into with `int`. Hot code should
+    compare the indices in the map matrices directly."""
+
     def __init__(self, name: str, symbol: str):
         self.name = name
         self.symbol = symbol
@@ -11,24 +19,26 @@ class TileType:
     def __repr__(self) -> str:
         return f"TileType(name={self.name}, symbol={self.symbol}, index={self.index})"
 
+    def __reduce__(self):
+        # Unpickled as the registered tile type of the same index, so that
+        # restored games share the tile types of the running program.
+        return Tiles.get, (self.index,)
+
     def __eq__(self, value: object) -> bool:
-        if isinstance(value, str):
-            if len(value) == 1:
-                return self.symbol == value
-            else:
-                return self.name == value
-        elif isinstance(value, int):
+        if value is self:
+            return True
+        if isinstance(value, int):
             return self.index == value
-        elif isinstance(value, TileType):
-            return all(
-                [
-                    self.name == value.name,
-                    self.index == value.index,
-                    self.symbol == value.symbol,
-                ]
-            )
+        if isinstance(value, str):
+            return self.symbol == value if len(value) == 1 else self.name == value
         return False
 
+    def __hash__(self) -> int:
+        return self.index
+
+    def __index__(self) -> int:
+        return self.index
+
     @classmethod
     def _get_available_index(cls) -> int:
         if not hasattr(cls, "next_index"):
@@ -38,6 +48,13 @@ class TileType:
         return cls.next_index
 
 
+# Symbols of the village and agent tiles of the teams, in team order. They
+# bound the number of teams a game can have.
+VILLAGE_SYMBOLS = "123456789abcdefghijklmnopqrstuvwxyz"
+AGENT_SYMBOLS = "OVABCDFJKLMNQRSTXYZ"
+MAX_TEAMS = min(len(VILLAGE_SYMBOLS), len(AGENT_SYMBOLS))
+
+
 @dataclass
 class Tiles:
     EMPTY = TileType("empty", "E")
@@ -53,9 +70,54 @@ class Tiles:
     AGENT_2 = TileType("agent2", "V")
     INVALID = TileType("invalid", "-")
 
+    # Village and agent tiles of every team, by team index. The tiles of the
+    # teams after the second are created on demand by `team_tiles`.
+    villages: ClassVar[list[TileType]] = [VILLAGE_1, VILLAGE_2]
+    agents: ClassVar[list[TileType]] = [AGENT_1, AGENT_2]
+
+    # Tile types ordered by their index, so that an index can be resolved
+    # without scanning the class attributes.
+    registry: ClassVar[tuple[TileType, ...]] = ()
+    # Index -> symbol lookup table. Indexing it with a whole matrix converts
+    # it to symbols in a single vectorized call.
+    symbols: ClassVar[np.ndarray] = np.empty(0, dtype="<U1")
+
     @classmethod
-    def get(cls, index: int):
-        for value in cls.__dict__.values():
-            if isinstance(value, TileType) and index == getattr(value, "index", -100):
-                return value
+    def get(cls, index: int) -> TileType:
+        if 0 <= index < len(cls.registry):
+            return cls.registry[index]
         return cls.UNKNOWN
+
+    @classmethod
+    def team_tiles(cls, team: int) -> tuple[TileType, TileType]:
+        """Returns the village and agent tiles of the team with index `team`,
+        registering new tile types for it if needed."""
+        if team >= MAX_TEAMS:
+            raise ValueError(f"There can be at most {MAX_TEAMS} teams.")
+
+        while len(cls.villages) <= team:
+            number = len(cls.villages) + 1
+            cls.villages.append(
+                TileType(f"village{number}", VILLAGE_SYMBOLS[number - 1])
+            )
+            cls.agents.append(TileType(f"agent{number}", AGENT_SYMBOLS[number - 1]))
+            cls._build_registry()
+
+        return cls.villages[team], cls.agents[team]
+
+    @classmethod
+    def to_symbols(cls, matrix: np.ndarray) -> np.ndarray:
+        return cls.symbols[matrix]
+
+    @classmethod
+    def _build_registry(cls):
+        tile_types = [v for v in vars(cls).values() if isinstance(v, TileType)]
+        tile_types += [t for t in cls.villages + cls.agents if t not in tile_types]
+        tile_types.sort(key=lambda tile_type: tile_type.index)
+        assert [t.index for t in tile_types] == list(range(len(tile_types)))
+
+        cls.registry = tuple(tile_types)
+        cls.symbols = np.array([t.symbol for t in tile_types], dtype="<U1")
+
+
+Tiles._build_registry()
@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+from benchmarks.suite import SCENARIOS_DIR, load_scenario
+from src import checkpoint
+from src.simulation import Simulation
+from src.swarm import Swarm
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+@pytest.mark.parametrize("engine", [Simulation, Swarm])
+def test_restored_game_plays_on_like_the_original(engine, compressed):
+    config, _ = load_scenario(os.path.join(SCENARIOS_DIR, "small_dense.toml"))
+    game = engine(config, 3)
+    for _ in range(5):
+        game.step()
+
+    restored = checkpoint.loads(checkpoint.dumps(game, compressed))
+    assert restored.state_hash() == game.state_hash()
+    for _ in range(15):
+        game.step()
+        restored.step()
+        assert restored.state_hash() == game.state_hash()
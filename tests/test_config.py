@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from benchmarks.suite import (
+    SCENARIOS_DIR,
+    find_scenarios,
+    load_scenario,
+    scenario_name,
+)
+from src.config import load_config
+
+# Map size and agents per team of every benchmark scenario.
+SCENARIOS = {
+    "small_dense": (20, 20, 3),
+    "small_sparse": (20, 20, 3),
+    "medium_single": (100, 100, 1),
+    "medium_dense": (100, 100, 10),
+    "medium_sparse": (100, 100, 10),
+    "medium_crowded": (100, 100, 25),
+    "large_dense": (500, 500, 10),
+    "large_sparse": (500, 500, 10),
+}
+
+
+def test_every_benchmark_scenario_is_covered():
+    names = {scenario_name(path) for path in find_scenarios(SCENARIOS_DIR)}
+    assert names == set(SCENARIOS)
+
+
+@pytest.mark.parametrize("name", sorted(SCENARIOS))
+def test_benchmark_scenario_sizes(name):
+    config, settings = load_scenario(os.path.join(SCENARIOS_DIR, f"{name}.toml"))
+    width, height, agents = SCENARIOS[name]
+    assert (config.width, config.height) == (width, height)
+    assert [team.agents for team in config.teams] == [agents, agents]
+    assert settings["max_rounds"] > 0
+
+
+def test_crowded_scenario_exceeds_the_viewer_cap():
+    path = os.path.join(SCENARIOS_DIR, "medium_crowded.toml")
+    with pytest.raises(ValueError):
+        load_config(path)
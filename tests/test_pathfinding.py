@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from src import pathfinding
+from src.map import Map
+from src.pathfinding import DistanceField, PathPlanner
+from src.tiles import Tiles
+from src.types import Coords
+
+# No terrain blocks movement in the game, so the tests make wood impassable
+# to exercise the code that reacts to passability changes.
+WALL = Tiles.WOOD
+FLOOR = Tiles.EMPTY
+
+
+@pytest.fixture(autouse=True)
+def walls(monkeypatch):
+    monkeypatch.setattr(pathfinding, "IMPASSABLE", frozenset({WALL.index}))
+
+
+def random_map(rng: np.random.Generator, height: int, width: int) -> Map:
+    walls = rng.random((height, width)) < rng.uniform(0.1, 0.4)
+    return Map(np.where(walls, WALL.index, FLOOR.index))
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_distance_field_repairs_like_a_full_recompute(seed):
+    rng = np.random.default_rng(seed)
+    map = random_map(rng, *rng.integers(2, 16, size=2))
+    sources = np.zeros(map.matrix.shape, dtype=bool)
+    x, y = rng.integers(map.height), rng.integers(map.width)
+    sources[x : x + 2, y : y + 2] = True
+    field = DistanceField(map, sources)
+
+    for _ in range(20):
+        x, y = rng.integers(map.height), rng.integers(map.width)
+        map.set_tile(Coords(x, y), WALL if rng.random() < 0.5 else FLOOR)
+        np.testing.assert_array_equal(field.distances, field._compute())
+
+
+def open_map(height: int, width: int) -> Map:
+    return Map(np.full((height, width), FLOOR.index))
+
+
+def test_planner_plans_again_when_its_path_is_walled():
+    map = open_map(5, 8)
+    planner = PathPlanner(map, move_range=1)
+    start, goal = Coords(2, 0), Coords(2, 7)
+    assert planner.next_step(start, goal) is not None
+    assert planner.searches == 1
+
+    # A wall off the path keeps it.
+    map.set_tile(Coords(0, 0), WALL)
+    assert not planner.is_stale
+
+    map.set_tile(planner.path[2], WALL)
+    assert planner.is_stale
+    planner.next_step(start, goal)
+    assert planner.searches == 2
+    assert all(map.get_tile(pos) != WALL for pos in planner.path)
+    assert planner.path[-1] == goal
+
+
+def test_planner_waits_for_the_goal_then_steps_aside():
+    map = open_map(5, 5)
+    map.set_tile(Coords(1, 3), WALL)
+    map.set_tile(Coords(3, 3), WALL)
+    planner = PathPlanner(map, move_range=1)
+    start, goal = Coords(2, 2), Coords(2, 3)
+
+    def is_blocked(pos: Coords) -> bool:
+        return pos == goal
+
+    for _ in range(planner.patience):
+        assert planner.next_step(start, goal, is_blocked) is None
+
+    step = planner.next_step(start, goal, is_blocked)
+    assert step is not None and step != goal
+    assert map.get_tile(step) != WALL
+    assert max(abs(step.x - goal.x), abs(step.y - goal.y)) == 1
+    assert planner.is_stale
@@ -0,0 +1,56 @@
+import pytest
+
+from src.config import GameConfig
+from src.simulation import Simulation, village_center
+from src.swarm import Swarm
+from src.types import Coords
+
+
+def make_config(width: int, height: int, teams: int = 2) -> GameConfig:
+    return GameConfig(
+        agents=3,
+        energy_pots=20,
+        energy_pots_energy=100,
+        golds=20,
+        energy_pot_price=2,
+        map_price=3,
+        width=width,
+        height=height,
+        resources={"wood": 10, "wheat": 6, "iron": 6},
+        teams=[{"wood": 5, "wheat": 2, "iron": 1} for _ in range(teams)],
+        seed=0,
+    )
+
+
+def test_village_centers_of_square_map():
+    config = make_config(20, 20)
+    assert village_center(config, 0) == Coords(6, 6)
+    assert village_center(config, 1) == Coords(14, 14)
+
+
+def test_villages_of_non_square_map_are_on_the_map():
+    for width, height in ((40, 20), (20, 40)):
+        for teams in (2, 3, 4):
+            config = make_config(width, height, teams)
+            simulation = Simulation(config)
+            for team in simulation.teams:
+                center = team.village.center
+                assert 0 <= center.x < height and 0 <= center.y < width
+                assert simulation.map.count(team.village.tile) > 0
+
+
+def round_hashes(engine: type, config: GameConfig, seed: int, rounds: int) -> list:
+    game = engine(config, seed)
+    hashes = []
+    for _ in range(rounds):
+        game.step()
+        hashes.append(game.state_hash())
+    return hashes
+
+
+@pytest.mark.parametrize("engine", [Simulation, Swarm])
+def test_same_seed_plays_the_same_game(engine):
+    config = make_config(30, 30)
+    hashes = round_hashes(engine, config, 7, 60)
+    assert round_hashes(engine, config, 7, 60) == hashes
+    assert round_hashes(engine, config, 8, 60) != hashes
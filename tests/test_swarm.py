@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+from benchmarks.suite import SCENARIOS_DIR, load_scenario
+from src.simulation import Simulation
+from src.swarm import Swarm
+
+SEEDS = range(4)
+# Largest relative difference between the mean rounds to win of the engines.
+ROUNDS_TOLERANCE = 0.15
+MAX_ROUNDS = 1000
+
+
+def play(engine: type, scenario: str) -> tuple[list, float]:
+    """Winners of the seeds and the mean rounds of the games that were won."""
+    config, _ = load_scenario(os.path.join(SCENARIOS_DIR, f"{scenario}.toml"))
+    results = [engine(config, seed).run(MAX_ROUNDS) for seed in SEEDS]
+    won = [r.rounds for r in results if r.winner is not None]
+    return [r.winner for r in results], sum(won) / max(len(won), 1)
+
+
+@pytest.mark.parametrize("scenario", ["small_dense", "medium_crowded"])
+def test_swarm_plays_like_the_object_model(scenario):
+    winners, rounds = play(Simulation, scenario)
+    swarm_winners, swarm_rounds = play(Swarm, scenario)
+
+    # Every team wins as many of the seeds, give or take one.
+    for team in set(winners) | set(swarm_winners):
+        assert abs(winners.count(team) - swarm_winners.count(team)) <= 1
+    assert abs(swarm_rounds - rounds) <= ROUNDS_TOLERANCE * rounds